@@ -0,0 +1,42 @@
+"""add secondary indexes
+
+Revision ID: 0304945aef28
+Revises: b6cca45c2fa4
+Create Date: 2026-10-18 02:38:11.670706
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0304945aef28'
+down_revision: Union[str, Sequence[str], None] = 'b6cca45c2fa4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # fails if users already holds duplicate emails, which signup never allowed
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_books_created_at_uid', 'books', ['created_at', 'uid'], unique=False)
+    op.create_index('ix_books_user_uid_created_at_uid', 'books', ['user_uid', 'created_at', 'uid'], unique=False)
+    op.create_index('ix_books_updated_at', 'books', ['updated_at'], unique=False)
+    op.create_index('ix_reviews_book_uid', 'reviews', ['book_uid'], unique=False)
+    op.create_index('ix_reviews_user_uid', 'reviews', ['user_uid'], unique=False)
+    op.create_index('ix_reviews_updated_at', 'reviews', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reviews_updated_at', table_name='reviews')
+    op.drop_index('ix_reviews_user_uid', table_name='reviews')
+    op.drop_index('ix_reviews_book_uid', table_name='reviews')
+    op.drop_index('ix_books_updated_at', table_name='books')
+    op.drop_index('ix_books_user_uid_created_at_uid', table_name='books')
+    op.drop_index('ix_books_created_at_uid', table_name='books')
+    op.drop_index('ix_users_email', table_name='users')
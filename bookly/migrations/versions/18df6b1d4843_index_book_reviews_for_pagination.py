@@ -0,0 +1,34 @@
+"""index book reviews for pagination
+
+Revision ID: 18df6b1d4843
+Revises: 74af90758b49
+Create Date: 2026-10-18 02:43:25.927860
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '18df6b1d4843'
+down_revision: Union[str, Sequence[str], None] = '74af90758b49'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reviews_book_uid_created_at_uid', 'reviews', ['book_uid', 'created_at', 'uid'], unique=False)
+    op.create_index('ix_reviews_book_uid_rating_created_at_uid', 'reviews', ['book_uid', 'rating', 'created_at', 'uid'], unique=False)
+    # covered by the leading column of both indexes above
+    op.drop_index('ix_reviews_book_uid', table_name='reviews')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_reviews_book_uid', 'reviews', ['book_uid'], unique=False)
+    op.drop_index('ix_reviews_book_uid_rating_created_at_uid', table_name='reviews')
+    op.drop_index('ix_reviews_book_uid_created_at_uid', table_name='reviews')
@@ -0,0 +1,63 @@
+"""add book rating aggregates
+
+Revision ID: 74af90758b49
+Revises: 0304945aef28
+Create Date: 2026-10-18 02:41:44.156221
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '74af90758b49'
+down_revision: Union[str, Sequence[str], None] = '0304945aef28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('review_count', sa.INTEGER(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_sum', sa.INTEGER(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_histogram', postgresql.ARRAY(sa.INTEGER()), server_default='{0,0,0,0,0}', nullable=False))
+    op.add_column('books', sa.Column('rating_avg', postgresql.DOUBLE_PRECISION(), nullable=True))
+    # backfill from the existing reviews; from here on ReviewService keeps them current
+    op.execute("""
+        UPDATE books SET
+            review_count = agg.review_count,
+            rating_sum = agg.rating_sum,
+            rating_histogram = agg.rating_histogram,
+            rating_avg = agg.rating_sum::double precision / agg.review_count
+        FROM (
+            SELECT
+                book_uid,
+                count(*) AS review_count,
+                sum(rating) AS rating_sum,
+                ARRAY[
+                    count(*) FILTER (WHERE rating = 0),
+                    count(*) FILTER (WHERE rating = 1),
+                    count(*) FILTER (WHERE rating = 2),
+                    count(*) FILTER (WHERE rating = 3),
+                    count(*) FILTER (WHERE rating = 4)
+                ]::integer[] AS rating_histogram
+            FROM reviews
+            WHERE book_uid IS NOT NULL
+            GROUP BY book_uid
+        ) AS agg
+        WHERE books.uid = agg.book_uid
+    """)
+    op.create_index('ix_books_rating_avg_review_count_uid', 'books', ['rating_avg', 'review_count', 'uid'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_rating_avg_review_count_uid', table_name='books')
+    op.drop_column('books', 'rating_avg')
+    op.drop_column('books', 'rating_histogram')
+    op.drop_column('books', 'rating_sum')
+    op.drop_column('books', 'review_count')
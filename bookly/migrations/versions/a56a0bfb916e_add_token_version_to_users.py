@@ -0,0 +1,29 @@
+"""add token version to users
+
+Revision ID: a56a0bfb916e
+Revises: ca67c4f2c0ad
+Create Date: 2026-10-18 02:25:48.894570
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a56a0bfb916e'
+down_revision: Union[str, Sequence[str], None] = 'ca67c4f2c0ad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.INTEGER(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,37 @@
+"""add book search vector
+
+Revision ID: b6cca45c2fa4
+Revises: a56a0bfb916e
+Create Date: 2026-10-18 02:36:13.933016
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6cca45c2fa4'
+down_revision: Union[str, Sequence[str], None] = 'a56a0bfb916e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('english', coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || coalesce(publisher, ''))", persisted=True),
+        nullable=True
+    ))
+    op.create_index('ix_books_search_vector', 'books', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_search_vector', table_name='books', postgresql_using='gin')
+    op.drop_column('books', 'search_vector')
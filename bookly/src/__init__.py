@@ -1,17 +1,28 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST
 from contextlib import asynccontextmanager
 from src.books.routes import book_router
 from src.auth.routes import auth_router
 from src.reviews.routes import review_router
-from src.db.main import init_db
+from src.db.main import close_db, get_pool_stats
+from src.db.redis import local_blocklist
+from src.auth.dependencies import RoleChecker
 from .errors import register_all_errors
 from .middleware import register_middleware
+from .responses import ORJSONResponse
+from .access_log import access_log
+from .metrics import render_metrics
 
 @asynccontextmanager
 async def life_span(app: FastAPI):
     print("=============================== Server is starting ================================== ")
-    await init_db()
+    access_log.start()
+    # the schema is managed by alembic (alembic upgrade head), so nothing is created here
+    local_blocklist.start()
     yield 
+    await local_blocklist.stop()
+    await close_db()
+    access_log.stop()
     print("=============================== Server has been stopped ============================= ")
 
 version = "v1"
@@ -22,7 +33,9 @@ app = FastAPI(
     version=version,
     docs_url=f"/api/{version}/docs",
     redoc_url=f"/api/{version}/redoc",
-    openapi_url=f"/api/{version}/openapi.json"
+    openapi_url=f"/api/{version}/openapi.json",
+    lifespan=life_span,
+    default_response_class=ORJSONResponse
 )
 
 register_all_errors(app)
@@ -30,4 +43,13 @@ register_middleware(app)
 
 app.include_router(book_router, prefix=f"/api/{version}/books", tags=["books"])
 app.include_router(auth_router, prefix=f"/api/{version}/auth", tags=["auth"])
-app.include_router(review_router, prefix=f"/api/{version}/reviews", tags=["reviews"])
\ No newline at end of file
+app.include_router(review_router, prefix=f"/api/{version}/reviews", tags=["reviews"])
+
+@app.get(f"/api/{version}/db/pool", tags=["monitoring"], dependencies=[Depends(RoleChecker(["admin"]))])
+async def database_pool_stats():
+    return get_pool_stats()
+
+# scraped by Prometheus, so it takes no token; keep it off the public ingress
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
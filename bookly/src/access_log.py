@@ -0,0 +1,72 @@
+from logging.handlers import QueueHandler, QueueListener
+import json
+import logging
+import queue
+import random
+import sys
+from src.config import Config
+
+access_logger = logging.getLogger("bookly.access")
+access_logger.setLevel(logging.INFO)
+access_logger.propagate = False
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.access, separators=(",", ":"), default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread as they are: no formatting on the event loop, and
+    records are dropped (and counted) instead of blocking when the queue is full
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class AccessLog:
+    """
+    JSON-lines access log written to a stream by a background thread through a bounded queue
+    """
+    def __init__(self, max_queue: int, sample_rate: float, stream=None):
+        self.sample_rate = sample_rate
+        self.stream = stream
+        self.handler = DroppingQueueHandler(queue.Queue(maxsize=max_queue))
+        self.listener: QueueListener | None = None
+
+    def start(self) -> None:
+        if self.listener is not None:
+            return
+        output = logging.StreamHandler(self.stream or sys.stdout)
+        output.setFormatter(JsonLinesFormatter())
+        self.listener = QueueListener(self.handler.queue, output)
+        self.listener.start()
+        access_logger.addHandler(self.handler)
+
+    def stop(self) -> None:
+        if self.listener is None:
+            return
+        access_logger.removeHandler(self.handler)
+        # drains whatever is still queued before returning
+        self.listener.stop()
+        self.listener = None
+
+    def log(self, entry: dict) -> None:
+        # errors are always kept; successful requests are sampled
+        if entry["status"] < 400 and self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        entry["dropped"] = self.handler.dropped
+        access_logger.info("access", extra={"access": entry})
+
+    def stats(self) -> dict:
+        return {"queued": self.handler.queue.qsize(), "dropped": self.handler.dropped}
+
+access_log = AccessLog(Config.ACCESS_LOG_QUEUE_SIZE, Config.ACCESS_LOG_SAMPLE_RATE)
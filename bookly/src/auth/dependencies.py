@@ -6,33 +6,71 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 
 from .utils import verify_access_token
-from src.db.redis import token_in_blocklist
+from src.db.redis import token_in_blocklist, principal_cache
 from src.db.main import get_session
 from .service import UserService
-from src.db.models import User
-from src.errors import InvalidToken,AccessTokenRequired, RefreshTokenRequired,InsufficientPermission, AccountNotVerified
+from .schemas import Principal
+from src.errors import InvalidToken,AccessTokenRequired, RefreshTokenRequired,InsufficientPermission, AccountNotVerified, RevokedToken
 
 user_service = UserService()
 
+class AuthContext:
+    """
+    Per-request authentication state, shared by every bearer / user dependency on a route
+    so the token is decoded and checked against the blocklist once, and the user is loaded once
+    """
+    def __init__(self, token: str, token_data: dict, user: Principal):
+        self.token = token
+        self.token_data = token_data
+        self.user = user
+
+async def get_principal(token_user: dict, session: AsyncSession) -> Principal | None:
+    user_uid = token_user.get("user_uid")
+    if user_uid is not None:
+        cached = await principal_cache.get(user_uid)
+        if cached is not None:
+            return Principal(**cached)
+
+    principal = await user_service.get_principal_by_email(token_user["email"], session)
+    if principal is not None:
+        await principal_cache.set(str(principal.uid), principal.model_dump(mode="json"))
+    return principal
+
+async def get_auth_context(request: Request, token: str, session: AsyncSession) -> AuthContext:
+    context = getattr(request.state, "auth_context", None)
+    if context is not None and context.token == token:
+        return context
+
+    token_data = verify_access_token(token)
+    if token_data is None:
+        raise InvalidToken()
+
+    if await token_in_blocklist(token_data["jti"]):
+        raise InvalidToken()
+
+    user = await get_principal(token_data["user"], session)
+    if user is None:
+        raise InvalidToken()
+
+    # tokens issued before the user's last "log out everywhere" carry an older version
+    if token_data.get("ver", 0) != user.token_version:
+        raise RevokedToken()
+
+    context = AuthContext(token, token_data, user)
+    request.state.auth_context = context
+    return context
+
 class TokenBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super().__init__(auto_error=auto_error)
 
-    async def __call__(self, request: Request) -> HTTPAuthorizationCredentials | None:
+    async def __call__(self, request: Request, session: AsyncSession = Depends(get_session)) -> HTTPAuthorizationCredentials | None:
         credentials = await super().__call__(request)
-        token = credentials.credentials
-
-        token_data = verify_access_token(token)
-
-        if not self.verify_token(token):
-            raise InvalidToken()
-        
-        if await token_in_blocklist(token_data["jti"]):
-            raise InvalidToken()
+        context = await get_auth_context(request, credentials.credentials, session)
 
-        self.verify_token_data(token_data)
+        self.verify_token_data(context.token_data)
 
-        return token_data
+        return context.token_data
     
     def verify_token(self, token: str) -> bool:
         token_data = verify_access_token(token)
@@ -51,17 +89,16 @@ class RefreshTokenBearer(TokenBearer):
         if token_data and not token_data["refresh"]:
             raise RefreshTokenRequired()
 
-async def get_current_user(token_details: dict = Depends(AccessTokenBearer()), session: AsyncSession = Depends(get_session)):
-    user_email = token_details["user"]["email"]
-    user = await user_service.get_user_by_email(user_email, session)
+access_token_bearer = AccessTokenBearer()
 
-    return user
+async def get_current_user(request: Request, token_details: dict = Depends(access_token_bearer)) -> Principal:
+    return request.state.auth_context.user
 
 class RoleChecker:
     def __init__(self, allowed_roles: List[str]) -> None:
         self.allowed_roles = allowed_roles
 
-    async def __call__(self, current_user: User= Depends(get_current_user)):
+    async def __call__(self, current_user: Principal = Depends(get_current_user)):
         if not current_user.is_verified:
             raise AccountNotVerified()
         if current_user.role not in self.allowed_roles:
@@ -1,18 +1,19 @@
 from fastapi import APIRouter, Depends, status, BackgroundTasks
-from fastapi.responses import JSONResponse
+from src.responses import ORJSONResponse
 from fastapi.exceptions import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import timedelta, datetime
-from .schemas import CreateUser, UserModel, UserLogin, UserBooks, Email, PasswordResetRequest, PasswordReset
+from typing import Optional
+from .schemas import CreateUser, UserModel, UserLogin, UserBooks, Email, PasswordResetRequest, PasswordReset, Principal
 from .service import UserService
-from .utils import create_access_token, verify_password, create_url_safe_token, decode_url_safe_token, generate_hash
-from src.db.main import get_session
+from .utils import create_access_token, verify_and_update_password, decode_url_safe_token, generate_hash, password_reset_email
+from src.db.main import get_session, get_read_session
 from src.db.redis import add_jti_to_blocklist
-from .dependencies import RefreshTokenBearer, AccessTokenBearer, get_current_user, RoleChecker
+from .dependencies import RefreshTokenBearer, access_token_bearer, get_current_user, RoleChecker
 from src.errors import UserAlreadyExists, InvalidCredentials, InvalidToken, UserNotFound
 # from src.mail import mail, create_message
-from src.config import Config
-from src.celery_tasks import send_email
+from src.fields import parse_fields, fields_response
+from src.outbox import SEND_EMAIL, enqueue_task
 
 auth_router = APIRouter()
 user_service = UserService()
@@ -20,14 +21,15 @@ role_checker = RoleChecker(["admin", "user"])
 REFRESH_TOKEN_EXPIRY = 2
 
 @auth_router.post("/send_mail")
-async def send_mail(emails: Email):
+async def send_mail(emails: Email, session: AsyncSession = Depends(get_session)):
     emails = emails.email_addresses
     html = "<h1>Welcome to the App!</h1>"
     subject = "Welcome to Bookly"
 
     # message = create_message(emails, "Welcome", html)
     # await mail.send_message(message)
-    send_email.delay(emails, subject, html)
+    enqueue_task(session, SEND_EMAIL, recipients=emails, subject=subject, body=html)
+    await session.commit()
 
     return {"message": "Email sent successfully"}
 
@@ -39,19 +41,8 @@ async def create_user_account(user_data: CreateUser, bg_tasks: BackgroundTasks,
     if user_exists:
         raise UserAlreadyExists()
 
+    # also queues the verification email
     new_user = await user_service.create_user(user_data, session)
-    token = create_url_safe_token({"email": email})
-    link = f"http://{Config.DOMAIN}/api/v1/auth/verify/{token}"
-
-    html_message = f"""
-    <h1>Verify your email</h1>
-    <p>Please click the link below to verify your email address:</p>
-    <a href="{link}">Verify Email</a>
-    """
-    # message = create_message([email], "Verify Your Email - Bookly", html_message)
-
-    # bg_tasks.add_task(mail.send_message, message)
-    send_email.delay([email], "Verify Your Email - Bookly", html_message)
 
     return {
         "message": "Account Created Successfully! Check your email to verify your account.",
@@ -70,13 +61,13 @@ async def verify_user_account(token: str, session: AsyncSession = Depends(get_se
         
         await user_service.update_user(user, {"is_verified": True}, session)
 
-        return JSONResponse(
+        return ORJSONResponse(
             content={
                 "message": "Email verified successfully"
             },
             status_code=status.HTTP_200_OK
         )
-    return JSONResponse(
+    return ORJSONResponse(
         content={
             "message": "Something went wrong during verification!"
         },
@@ -92,13 +83,17 @@ async def login_user(user_data: UserLogin, session: AsyncSession = Depends(get_s
     if user is None:
         raise InvalidCredentials()
 
-    if not verify_password(password, user.password):
+    password_valid, new_hash = await verify_and_update_password(password, user.password)
+    if not password_valid:
         raise InvalidCredentials()
 
-    access_token = create_access_token({"email": user.email, "user_uid": str(user.uid), "role": user.role})
-    refresh_token = create_access_token({"email": user.email, "user_uid": str(user.uid)}, refresh=True, expiry=timedelta(days= REFRESH_TOKEN_EXPIRY))
+    if new_hash is not None:
+        await user_service.update_user(user, {"password": new_hash}, session)
 
-    return JSONResponse(
+    access_token = create_access_token({"email": user.email, "user_uid": str(user.uid), "role": user.role}, token_version=user.token_version)
+    refresh_token = create_access_token({"email": user.email, "user_uid": str(user.uid)}, refresh=True, expiry=timedelta(days= REFRESH_TOKEN_EXPIRY), token_version=user.token_version)
+
+    return ORJSONResponse(
         content={
             "message": "Login Successful",
             "access_token": access_token,
@@ -116,10 +111,11 @@ async def get_new_access_token(token_details: dict = Depends(RefreshTokenBearer(
     expiry_timestamp = token_details["exp"]
     if datetime.fromtimestamp(expiry_timestamp) > datetime.now():
         new_access_token = create_access_token(
-            user_data=token_details["user"]
+            user_data=token_details["user"],
+            token_version=token_details.get("ver", 0)
         )
 
-        return JSONResponse(
+        return ORJSONResponse(
             content= {
                 "access_token": new_access_token
             }
@@ -128,34 +124,41 @@ async def get_new_access_token(token_details: dict = Depends(RefreshTokenBearer(
     raise InvalidToken()
 
 @auth_router.get("/me", response_model=UserBooks)
-async def get_current_user(user: UserModel = Depends(get_current_user), _: bool= Depends(role_checker)):
+async def get_me(fields: Optional[str] = None, principal: Principal = Depends(get_current_user), _: bool= Depends(role_checker), session: AsyncSession = Depends(get_read_session)):
+    requested = parse_fields(fields, UserBooks)
+    if requested:
+        user = await user_service.get_user_fields(principal.email, requested, session)
+        if user is None:
+            raise UserNotFound()
+        return fields_response({name: user[name] for name in requested})
+
+    user = await user_service.get_user_by_email(principal.email, session, load_relations=True)
+    if user is None:
+        raise UserNotFound()
     return user
 
 @auth_router.get("/logout", status_code=status.HTTP_200_OK)
-async def revoke_token(token_details: dict = Depends(AccessTokenBearer())):
+async def revoke_token(token_details: dict = Depends(access_token_bearer)):
     jti = token_details["jti"]
 
-    await add_jti_to_blocklist(jti)
-    return JSONResponse(
+    await add_jti_to_blocklist(jti, token_details["exp"])
+    return ORJSONResponse(
         content={"message": "Logged out successfully"}
     )
 
+@auth_router.get("/logout_all", status_code=status.HTTP_200_OK)
+async def revoke_all_tokens(principal: Principal = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
+    await user_service.revoke_all_tokens(principal.uid, session)
+    return ORJSONResponse(
+        content={"message": "Logged out of all sessions successfully"}
+    )
+
 @auth_router.post("/reset_password_request")
-async def reset_password_request(email: PasswordResetRequest, bg_tasks: BackgroundTasks):
-    token = create_url_safe_token({"email": email.email})
-    link = f"http://{Config.DOMAIN}/api/v1/auth/reset_password/{token}"
-
-    html_message = f"""
-    <h1>Reset Your Password</h1>
-    <p>Please click the link below to reset your password:</p>
-    <a href="{link}">Reset Password</a>
-    """
-    # message = create_message([email.email], "Reset Your Password - Bookly", html_message)
-
-    # bg_tasks.add_task(mail.send_message, message)
-    send_email.delay([email.email], "Reset Your Password - Bookly", html_message)
+async def reset_password_request(email: PasswordResetRequest, bg_tasks: BackgroundTasks, session: AsyncSession = Depends(get_session)):
+    enqueue_task(session, SEND_EMAIL, **password_reset_email(email.email))
+    await session.commit()
     
-    return JSONResponse(
+    return ORJSONResponse(
         content={
             "message": "Please check your email for instructions to reset your password."
         },
@@ -175,15 +178,15 @@ async def reset_password(token: str, password_data: PasswordReset, session: Asyn
         if not user:
             raise UserNotFound()
         
-        await user_service.update_user(user, {"password": generate_hash(password_data.password)}, session)
+        await user_service.update_user(user, {"password": await generate_hash(password_data.password)}, session)
 
-        return JSONResponse(
+        return ORJSONResponse(
             content={
                 "message": "Password reset successful."
             },
             status_code=status.HTTP_200_OK
         )
-    return JSONResponse(
+    return ORJSONResponse(
         content={
             "message": "Something went wrong during password reset!"
         },
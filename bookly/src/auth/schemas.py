@@ -24,6 +24,13 @@ class UserModel(BaseModel):
     updated_at: datetime 
     is_verified: bool
 
+class Principal(BaseModel):
+    uid: uuid.UUID
+    email: str
+    role: str
+    is_verified: bool
+    token_version: int = 0
+
 class UserBooks(UserModel):
     books: List[Books]
     reviews: List[Review]
@@ -1,25 +1,59 @@
-from sqlmodel import select
+from sqlmodel import select, update
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.models import User
-from .schemas import CreateUser
-from .utils import generate_hash
+from sqlalchemy.orm import selectinload
+from src.db.models import User, Book, Review
+from src.db.redis import principal_cache
+from src.fields import select_fields, project
+from src.books.schemas import Books
+from .schemas import CreateUser, Principal
+from src.outbox import SEND_EMAIL, enqueue_task
+from .utils import generate_hash, verification_email
 
 class UserService:
-    async def get_user_by_email(self, email: str, session: AsyncSession):
+    async def get_user_by_email(self, email: str, session: AsyncSession, load_relations: bool = False):
         statement = select(User).where(User.email == email)
+        if load_relations:
+            statement = statement.options(selectinload(User.books), selectinload(User.reviews))
         result = await session.exec(statement)
         return result.first()
+
+    async def get_user_fields(self, email: str, fields: list[str], session: AsyncSession):
+        """
+        Only the requested user columns, plus the books / reviews relations when they are
+        among the fields. Returns a dict, or None when there is no such user.
+        """
+        result = await session.exec(select_fields(User, fields, "uid").where(User.email == email))
+        row = result.first()
+        if row is None:
+            return None
+        user = project(row, fields)
+        if "books" in fields:
+            book_fields = list(Books.model_fields)
+            books = await session.exec(select_fields(Book, book_fields).where(Book.user_uid == row.uid))
+            user["books"] = [project(book, book_fields) for book in books]
+        if "reviews" in fields:
+            user["reviews"] = (await session.exec(select(Review).where(Review.user_uid == row.uid))).all()
+        return user
+
+    async def get_principal_by_email(self, email: str, session: AsyncSession):
+        statement = select(User.uid, User.email, User.role, User.is_verified, User.token_version).where(User.email == email)
+        result = await session.exec(statement)
+        row = result.first()
+        return Principal(**row._mapping) if row is not None else None
     
     async def user_exists(self, email: str, session: AsyncSession):
-        user = await self.get_user_by_email(email, session)
-        return user is not None
+        statement = select(User.uid).where(User.email == email)
+        result = await session.exec(statement)
+        return result.first() is not None
     
     async def create_user(self, user_data: CreateUser, session: AsyncSession):
         user = user_data.model_dump()
         new_user = User(**user)
-        new_user.password = generate_hash(new_user.password)
+        new_user.password = await generate_hash(new_user.password)
         new_user.role = "user"
         session.add(new_user)
+        # committed with the user, so the email is never lost nor sent for a user that doesn't exist
+        enqueue_task(session, SEND_EMAIL, **verification_email(new_user.email))
         await session.commit()
         return new_user
     
@@ -27,4 +61,13 @@ class UserService:
         for key, value in user_data.items():
             setattr(user, key, value)
         await session.commit()
-        return user
\ No newline at end of file
+        # role, is_verified and friends are cached per uid for auth, drop the stale copy
+        await principal_cache.invalidate(str(user.uid))
+        return user
+
+    async def revoke_all_tokens(self, user_uid: str, session: AsyncSession):
+        # every token carries the version it was issued with, bumping it invalidates them all
+        statement = update(User).where(User.uid == user_uid).values(token_version=User.token_version + 1)
+        await session.exec(statement)
+        await session.commit()
+        await principal_cache.invalidate(str(user_uid))
@@ -1,29 +1,70 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime
 from itsdangerous import URLSafeTimedSerializer
+import asyncio
 import jwt
 import uuid
 import logging
 
 from src.config import Config
+from src.metrics import PASSWORD_HASH_QUEUED, PASSWORD_HASH_MAX_QUEUED, PASSWORD_HASH_IN_FLIGHT, PASSWORD_HASH_COMPLETED
 
 ACCESS_TOKEN_EXPIRY = 3600
 
-pwd_context = CryptContext(schemes=["bcrypt"])
+# changing BCRYPT_ROUNDS makes verify_and_update_password hand back a rehash for older hashes
+pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=Config.BCRYPT_ROUNDS)
 
-def generate_hash(password: str) -> str:
-    return pwd_context.hash(password)
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+hash_executor = ThreadPoolExecutor(max_workers=Config.PASSWORD_HASH_CONCURRENCY, thread_name_prefix="bcrypt")
+hash_slots = asyncio.Semaphore(Config.PASSWORD_HASH_CONCURRENCY)
+# the depth of the hashing queue, published as PASSWORD_HASH_* metrics
+hash_queue = {"queued": 0, "max_queued": 0}
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+def set_queued(delta: int) -> None:
+    hash_queue["queued"] += delta
+    hash_queue["max_queued"] = max(hash_queue["max_queued"], hash_queue["queued"])
+    PASSWORD_HASH_QUEUED.set(hash_queue["queued"])
+    PASSWORD_HASH_MAX_QUEUED.set(hash_queue["max_queued"])
 
-def create_access_token(user_data: dict, expiry: timedelta = None, refresh: bool = False) -> str:
+async def run_in_hash_pool(func, *args):
+    set_queued(1)
+    waiting = True
+    try:
+        async with hash_slots:
+            set_queued(-1)
+            waiting = False
+            PASSWORD_HASH_IN_FLIGHT.inc()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(hash_executor, func, *args)
+            finally:
+                PASSWORD_HASH_IN_FLIGHT.dec()
+                PASSWORD_HASH_COMPLETED.inc()
+    finally:
+        if waiting:
+            set_queued(-1)
+
+async def generate_hash(password: str) -> str:
+    return await run_in_hash_pool(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await run_in_hash_pool(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Returns whether the password matches and, when the stored hash uses an outdated
+    work factor, a fresh hash that should replace it
+    """
+    return await run_in_hash_pool(pwd_context.verify_and_update, plain_password, hashed_password)
+
+def create_access_token(user_data: dict, expiry: timedelta = None, refresh: bool = False, token_version: int = 0) -> str:
     payload = {}
 
     payload["user"] = user_data
     payload["exp"] = datetime.now() + (expiry if expiry is not None else timedelta(seconds=ACCESS_TOKEN_EXPIRY))
     payload["jti"] = str(uuid.uuid4())
     payload["refresh"] = refresh
+    payload["ver"] = token_version
 
     token = jwt.encode(
         payload= payload,
@@ -54,4 +95,22 @@ def decode_url_safe_token(token: str):
         return serializer.loads(token)
     except Exception as e:
         logging.exception(e)
-        return None
\ No newline at end of file
+        return None
+
+def verification_email(email: str) -> dict:
+    link = f"http://{Config.DOMAIN}/api/v1/auth/verify/{create_url_safe_token({'email': email})}"
+    html_message = f"""
+    <h1>Verify your email</h1>
+    <p>Please click the link below to verify your email address:</p>
+    <a href="{link}">Verify Email</a>
+    """
+    return {"recipients": [email], "subject": "Verify Your Email - Bookly", "body": html_message}
+
+def password_reset_email(email: str) -> dict:
+    link = f"http://{Config.DOMAIN}/api/v1/auth/reset_password/{create_url_safe_token({'email': email})}"
+    html_message = f"""
+    <h1>Reset Your Password</h1>
+    <p>Please click the link below to reset your password:</p>
+    <a href="{link}">Reset Password</a>
+    """
+    return {"recipients": [email], "subject": "Reset Your Password - Bookly", "body": html_message}
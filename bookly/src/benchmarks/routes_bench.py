@@ -0,0 +1,185 @@
+"""
+Drives the real app in-process through an ASGI client and reports latency per route:
+
+    python -m src.benchmarks.routes_bench --reset [--concurrency 10] [--requests 200] [--output bench.json]
+
+It runs against DATABASE_URI, which it DROPS, recreates and fills with src.db.seed, so point that
+at a scratch Postgres database. Redis is replaced by fakeredis and emails only reach the outbox
+table, so no other service is needed. Each route gets --requests requests from --concurrency
+concurrent clients; the JSON report (p50/p95/p99 latency, throughput, queries per request) is meant
+to be diffed between versions.
+"""
+from collections import Counter
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+import uuid
+import fakeredis
+import httpx
+from sqlmodel import SQLModel, select
+from src import app
+from src.db import redis
+from src.db.instrumentation import queries_in
+from src.db.main import engine, async_session_maker
+from src.db.models import Book, RATING_BUCKETS
+from src.db.seed import SEED_PASSWORD, seed_catalog
+
+# a seeded user; every seeded user has the same password
+BENCH_EMAIL = "user0@example.com"
+BENCH_PASSWORD = SEED_PASSWORD
+
+def use_stand_ins() -> None:
+    fake = fakeredis.FakeAsyncRedis()
+    redis.token_blocklist = fake
+    redis.local_blocklist.client = fake
+    redis.principal_cache.client = fake
+
+async def seed(users: int, books: int, reviews: int, seed: int) -> dict:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+        await conn.run_sync(SQLModel.metadata.create_all)
+    await seed_catalog(engine, users, books, reviews, seed=seed)
+
+    async with async_session_maker() as session:
+        # uids are random, so the lowest ones are a spread of popular and long-tail books
+        book_uids = (await session.exec(select(Book.uid).order_by(Book.uid).limit(1000))).all()
+    return {"book_uids": [str(uid) for uid in book_uids]}
+
+def scenarios(context: dict) -> dict:
+    headers = {"Authorization": f"Bearer {context['access_token']}"}
+    book_uids = context["book_uids"]
+    created_reviews = context["created_reviews"]
+    run_id = uuid.uuid4().hex[:6]
+
+    async def review_create(client, i):
+        response = await client.post(
+            f"/api/v1/reviews/book/{book_uids[i % len(book_uids)]}", headers=headers,
+            json={"rating": i % RATING_BUCKETS, "review_text": "Benchmark review"}
+        )
+        if response.status_code == 201:
+            created_reviews.append(response.json()["uid"])
+        return response
+
+    async def review_delete(client, i):
+        return await client.delete(f"/api/v1/reviews/{created_reviews.pop()}", headers=headers)
+
+    return {
+        "list_books": lambda client, i: client.get("/api/v1/books/", headers=headers),
+        "search_books": lambda client, i: client.get("/api/v1/books/search", params={"q": "dune"}, headers=headers),
+        "top_rated": lambda client, i: client.get("/api/v1/books/top-rated", headers=headers),
+        "book_detail": lambda client, i: client.get(f"/api/v1/books/{book_uids[i % len(book_uids)]}", headers=headers),
+        "book_reviews": lambda client, i: client.get(f"/api/v1/books/{book_uids[i % len(book_uids)]}/reviews", headers=headers),
+        "me": lambda client, i: client.get("/api/v1/auth/me", headers=headers),
+        "login": lambda client, i: client.post("/api/v1/auth/login", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD}),
+        "signup": lambda client, i: client.post("/api/v1/auth/signup", json={
+            "username": f"s{run_id}{i}", "email": f"s{run_id}{i}@example.com", "password": BENCH_PASSWORD,
+            "first_name": "New", "last_name": "User"
+        }),
+        "review_create": review_create,
+        # deletes the reviews review_create made, so it has to run after it
+        "review_delete": review_delete,
+    }
+
+def percentile(ordered: list[float], q: float) -> float:
+    # nearest-rank
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+async def run_route(client, make_request, total: int, concurrency: int) -> dict:
+    latencies, queries, statuses = [], [], Counter()
+    indexes = iter(range(total))
+
+    async def worker():
+        for i in indexes:
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+            if "server-timing" in response.headers:
+                queries.append(queries_in(response))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 50) * 1000, 2),
+            "p95": round(percentile(ordered, 95) * 1000, 2),
+            "p99": round(percentile(ordered, 99) * 1000, 2),
+            "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+            "max": round(ordered[-1] * 1000, 2),
+        } if ordered else None,
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def benchmark(args) -> dict:
+    use_stand_ins()
+    context = await seed(args.users, args.books, args.reviews, args.seed)
+    context["created_reviews"] = []
+
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://localhost") as client:
+        login = await client.post("/api/v1/auth/login", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        login.raise_for_status()
+        context["access_token"] = login.json()["access_token"]
+        routes = scenarios(context)
+        for name in args.routes or list(routes):
+            total = args.requests
+            if name == "review_delete":
+                total = min(total, len(context["created_reviews"]))
+            results[name] = await run_route(client, routes[name], total, args.concurrency)
+            print(f"{name:>14}: {json.dumps(results[name]['latency_ms'])} {results[name]['throughput_rps']} rps", file=sys.stderr)
+    await engine.dispose()
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "concurrency": args.concurrency,
+            "requests_per_route": args.requests,
+            "seed": {"users": args.users, "books": args.books, "reviews": args.reviews, "seed": args.seed},
+        },
+        "routes": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reset", action="store_true", help="confirm that DATABASE_URI may be dropped and recreated")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--routes", nargs="+", help="subset of routes to run, in the given order")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--reviews", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated catalog (see src/db/seed.py)")
+    parser.add_argument("--output", default="benchmark-results.json")
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error("this drops every table in DATABASE_URI; pass --reset to confirm")
+
+    report = asyncio.run(benchmark(args))
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"wrote {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
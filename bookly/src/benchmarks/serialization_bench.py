@@ -0,0 +1,67 @@
+"""
+Compares the response paths for a page of books:
+
+    python -m src.benchmarks.serialization_bench [--rows 1000 10000] [--repeat 5]
+
+  default  - what routes did before: FastAPI validates the ORM rows into the response_model,
+             dumps that to a JSON-compatible dict and json.dumps it (JSONResponse)
+  orjson   - the same validation and dump, rendered by ORJSONResponse (the app default now)
+  model    - model_response(): one validation, rendered by pydantic-core straight to bytes
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import date, datetime
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from src.books.schemas import BookPage
+from src.db.models import Book
+from src.responses import ORJSONResponse, model_response
+
+def make_books(count: int) -> list[Book]:
+    now = datetime.now()
+    return [
+        Book(
+            uid=uuid.uuid4(), title=f"Book {i}", author="Some Author", publisher="Some Publisher",
+            published_date=date(2001, 1, 1), page_count=320, language="en", user_uid=uuid.uuid4(),
+            review_count=i % 50, rating_sum=i % 200, rating_histogram=[1, 2, 3, 4, 5], rating_avg=3.2,
+            created_at=now, updated_at=now
+        )
+        for i in range(count)
+    ]
+
+def best_of(repeat: int, render) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    field = create_model_field("Response_get_all_books", BookPage, mode="serialization")
+
+    def fastapi_path(response_class, books):
+        content = asyncio.run(serialize_response(field=field, response_content={"books": books, "next_cursor": None}))
+        return response_class(content).body
+
+    print(f"{'rows':>8} {'default ms':>12} {'orjson ms':>12} {'model ms':>12} {'speedup':>8}")
+    for count in args.rows:
+        books = make_books(count)
+        # all three must produce the same document
+        assert json.loads(fastapi_path(JSONResponse, books)) == json.loads(model_response(BookPage, {"books": books}).body)
+        default = best_of(args.repeat, lambda: fastapi_path(JSONResponse, books))
+        orjson = best_of(args.repeat, lambda: fastapi_path(ORJSONResponse, books))
+        model = best_of(args.repeat, lambda: model_response(BookPage, {"books": books}).body)
+        print(f"{count:>8} {default * 1000:>12.1f} {orjson * 1000:>12.1f} {model * 1000:>12.1f} {default / model:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
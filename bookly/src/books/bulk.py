@@ -0,0 +1,79 @@
+from typing import AsyncIterator
+from pydantic import ValidationError
+from datetime import date, datetime
+import csv
+import json
+import uuid
+from .schemas import BookCreateModel
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Re-splits a streamed request body into lines without buffering more than one partial line.
+    Lines stay undecoded, so a row that isn't UTF-8 is reported by iter_records like any other bad row.
+    """
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if pending:
+        yield pending.rstrip(b"\r")
+
+async def iter_records(lines: AsyncIterator[bytes], content_type: str) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Yields (line number, record, parse error) for every non-blank line of an NDJSON or
+    CSV body. CSV bodies must start with a header row; quoted fields can't span lines.
+    """
+    is_csv = content_type.startswith("text/csv")
+    header = None
+    line_number = 0
+    async for raw_line in lines:
+        line_number += 1
+        try:
+            line = raw_line.decode()
+        except UnicodeDecodeError as e:
+            yield line_number, None, f"invalid UTF-8: {e.reason} at byte {e.start}"
+            continue
+        if not line.strip():
+            continue
+        if is_csv:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = values
+                continue
+            if len(values) != len(header):
+                yield line_number, None, f"expected {len(header)} columns, got {len(values)}"
+                continue
+            yield line_number, dict(zip(header, values)), None
+        else:
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "expected a JSON object"
+                continue
+            yield line_number, record, None
+
+def build_book_row(record: dict, user_uid: uuid.UUID, now: datetime) -> dict:
+    """
+    Validates a record with BookCreateModel and returns the column values of the new book.
+    Raises ValidationError / ValueError for bad rows.
+    """
+    book = BookCreateModel.model_validate(record)
+    return {
+        "uid": uuid.uuid4(),
+        **book.model_dump(),
+        "published_date": date.fromisoformat(book.published_date),
+        "user_uid": user_uid,
+        "created_at": now,
+        "updated_at": now
+    }
+
+def describe_error(error: Exception) -> list:
+    if isinstance(error, ValidationError):
+        return [f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()]
+    return [str(error)]
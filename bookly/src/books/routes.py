@@ -1,29 +1,55 @@
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, status, Depends, Query, Request
 from fastapi.exceptions import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
-from typing import List
-from src.books.schemas import Books, BookUpdate, BookCreateModel, BookDetail
+from typing import Optional
+from datetime import datetime
+from src.books.schemas import Books, BookUpdate, BookCreateModel, BookDetail, BookPage, BulkImportReport
+from src.books.bulk import iter_lines, iter_records
 # from src.db.models import Book
 from src.books.service import BookService
+from src.reviews.service import ReviewService
+from src.reviews.schemas import Review, ReviewPage, ReviewSort
 # from src.books.book_data import books
-from src.db.main import get_session
-from src.auth.dependencies import AccessTokenBearer, RoleChecker
+from src.db.main import get_session, get_read_session
+from src.auth.dependencies import access_token_bearer, RoleChecker
 from src.errors import BookNotFound
+from src.config import Config
+from src.db.export import ExportFormat, export_response, as_local_time
+from src.etags import make_etag, is_not_modified, not_modified_response
+from src.fields import parse_fields, project, fields_response
+from src.responses import model_response
 
 book_router = APIRouter()
 book_service = BookService()
-access_token_bearer = AccessTokenBearer()
+review_service = ReviewService()
 role_checker = Depends(RoleChecker(["admin", "user"]))
 
-@book_router.get("/", response_model= List[Books], dependencies=[role_checker])
-async def get_all_books(session: AsyncSession = Depends(get_session), token_details: dict = Depends(access_token_bearer)):
-    books = await book_service.get_all_books(session)
-    return books
+def page_etag(rows: list, *request_parts) -> str:
+    # no Last-Modified on pages: a delete that shifts the page leaves the newest updated_at as it was,
+    # while the ETag covers which rows are on it
+    return make_etag(*request_parts, *(f"{row.uid}:{row.updated_at}" for row in rows))
 
-@book_router.get("/user/{user_id}", response_model= List[Books], dependencies=[role_checker])
-async def get_user_book_submissions(user_id: str,session: AsyncSession = Depends(get_session), token_details: dict = Depends(access_token_bearer)):
-    books = await book_service.get_user_books(user_id, session)
-    return books
+@book_router.get("/", response_model= BookPage, dependencies=[role_checker])
+async def get_all_books(request: Request, limit: int = Query(default=Config.PAGE_SIZE, ge=1, le=Config.MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, token_details: dict = Depends(access_token_bearer), session: AsyncSession = Depends(get_read_session)):
+    requested = parse_fields(fields, Books)
+    books, next_cursor = await book_service.get_all_books(session, limit, cursor, requested)
+    etag = page_etag(books, limit, cursor, next_cursor, fields)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    if requested:
+        return fields_response({"books": [project(book, requested) for book in books], "next_cursor": next_cursor}, etag)
+    return model_response(BookPage, {"books": books, "next_cursor": next_cursor}, etag)
+
+@book_router.get("/user/{user_id}", response_model= BookPage, dependencies=[role_checker])
+async def get_user_book_submissions(user_id: str, request: Request, limit: int = Query(default=Config.PAGE_SIZE, ge=1, le=Config.MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, token_details: dict = Depends(access_token_bearer), session: AsyncSession = Depends(get_read_session)):
+    requested = parse_fields(fields, Books)
+    books, next_cursor = await book_service.get_user_books(user_id, session, limit, cursor, requested)
+    etag = page_etag(books, user_id, limit, cursor, next_cursor, fields)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    if requested:
+        return fields_response({"books": [project(book, requested) for book in books], "next_cursor": next_cursor}, etag)
+    return model_response(BookPage, {"books": books, "next_cursor": next_cursor}, etag)
 
 @book_router.post("/", status_code= status.HTTP_201_CREATED, response_model=Books, dependencies=[role_checker])
 async def publish_a_book(book: BookCreateModel, session: AsyncSession = Depends(get_session), token_details: dict = Depends(access_token_bearer)) -> dict:
@@ -33,15 +59,86 @@ async def publish_a_book(book: BookCreateModel, session: AsyncSession = Depends(
     # books.append(new_book)
     return new_book
 
+@book_router.post("/bulk", response_model=BulkImportReport, dependencies=[role_checker])
+async def bulk_publish_books(request: Request, session: AsyncSession = Depends(get_session), token_details: dict = Depends(access_token_bearer)):
+    """
+    Accepts an NDJSON (application/x-ndjson) or CSV (text/csv, with header) stream of books
+    """
+    user_id = token_details.get("user")["user_uid"]
+    content_type = request.headers.get("content-type", "application/x-ndjson")
+    records = iter_records(iter_lines(request.stream()), content_type)
+    return await book_service.bulk_create_books(records, user_id, session)
+
+@book_router.get("/search", response_model= BookPage, dependencies=[role_checker])
+async def search_books(request: Request, q: str = Query(min_length=1, max_length=200), limit: int = Query(default=Config.PAGE_SIZE, ge=1, le=Config.MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, token_details: dict = Depends(access_token_bearer), session: AsyncSession = Depends(get_read_session)):
+    requested = parse_fields(fields, Books)
+    books, next_cursor = await book_service.search_books(q, session, limit, cursor, requested)
+    etag = page_etag(books, q, limit, cursor, next_cursor, fields)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    if requested:
+        return fields_response({"books": [project(book, requested) for book in books], "next_cursor": next_cursor}, etag)
+    return model_response(BookPage, {"books": books, "next_cursor": next_cursor}, etag)
+
+@book_router.get("/top-rated", response_model= BookPage, dependencies=[role_checker])
+async def get_top_rated_books(request: Request, min_reviews: int = Query(default=1, ge=1), limit: int = Query(default=Config.PAGE_SIZE, ge=1, le=Config.MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, token_details: dict = Depends(access_token_bearer), session: AsyncSession = Depends(get_read_session)):
+    requested = parse_fields(fields, Books)
+    books, next_cursor = await book_service.get_top_rated_books(session, limit, min_reviews, cursor, requested)
+    etag = page_etag(books, min_reviews, limit, cursor, next_cursor, fields)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    if requested:
+        return fields_response({"books": [project(book, requested) for book in books], "next_cursor": next_cursor}, etag)
+    return model_response(BookPage, {"books": books, "next_cursor": next_cursor}, etag)
+
+@book_router.get("/export", dependencies=[Depends(RoleChecker(["admin"]))])
+async def export_books(format: ExportFormat = "ndjson", since: Optional[datetime] = None, token_details: dict = Depends(access_token_bearer)):
+    return await export_response(book_service.export_statement(as_local_time(since)), format, "books")
+
 @book_router.get("/{book_id}", response_model=BookDetail, dependencies=[role_checker])
-async def get_a_book(book_id: str, session: AsyncSession = Depends(get_session), token_details: dict = Depends(access_token_bearer)) -> dict:
+async def get_a_book(book_id: str, request: Request, fields: Optional[str] = None, token_details: dict = Depends(access_token_bearer), session: AsyncSession = Depends(get_read_session)) -> dict:
     # for book in books:
     #     if book["id"] == book_id:
     #         return book
+    requested = parse_fields(fields, BookDetail)
+    version = await book_service.get_book_version(book_id, session)
+    if version is None:
+        raise BookNotFound()
+
+    # answer revalidations from the version row alone, without loading the book and its reviews
+    etag = make_etag(book_id, fields, *version)
+    last_modified = max((stamp for stamp in version[:2] if stamp is not None), default=None)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
+    if requested:
+        book = await book_service.get_book(book_id, session, requested)
+        if book is None:
+            raise BookNotFound()
+        content = project(book, requested)
+        if "reviews" in requested or "reviews_next_cursor" in requested:
+            content["reviews"], content["reviews_next_cursor"] = await review_service.get_book_reviews(book_id, session, Config.PAGE_SIZE)
+        return fields_response({name: content[name] for name in requested}, etag, last_modified)
+
     book = await book_service.get_book(book_id, session)
     if book is None:
         raise BookNotFound()
-    return book
+    reviews, reviews_next_cursor = await review_service.get_book_reviews(book_id, session, Config.PAGE_SIZE)
+    return model_response(BookDetail, {**book.model_dump(), "reviews": reviews, "reviews_next_cursor": reviews_next_cursor}, etag, last_modified)
+
+@book_router.get("/{book_id}/reviews", response_model=ReviewPage, dependencies=[role_checker])
+async def get_book_reviews(book_id: str, request: Request, sort: ReviewSort = "newest", limit: int = Query(default=Config.PAGE_SIZE, ge=1, le=Config.MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, token_details: dict = Depends(access_token_bearer), session: AsyncSession = Depends(get_read_session)):
+    requested = parse_fields(fields, Review)
+    reviews, next_cursor = await review_service.get_book_reviews(book_id, session, limit, sort, cursor, requested)
+    # an empty first page is either a book without reviews or no book at all
+    if not reviews and cursor is None and await book_service.get_book_version(book_id, session) is None:
+        raise BookNotFound()
+    etag = page_etag(reviews, book_id, sort, limit, cursor, next_cursor, fields)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    if requested:
+        return fields_response({"reviews": [project(review, requested) for review in reviews], "next_cursor": next_cursor}, etag)
+    return model_response(ReviewPage, {"reviews": reviews, "next_cursor": next_cursor}, etag)
 
 @book_router.patch("/{book_id}", response_model=Books, dependencies=[role_checker])
 async def update_a_book(book_id: str, update_book: BookUpdate, session: AsyncSession = Depends(get_session), token_details: dict = Depends(access_token_bearer)) -> dict:
@@ -65,8 +162,7 @@ async def delete_a_book(book_id: str, session: AsyncSession = Depends(get_sessio
     #     if book["id"] == book_id:
     #         books.remove(book)
     #         return {}
-    book_to_delete = await book_service.get_book(book_id, session)
-    if book_to_delete is None:
+    deleted = await book_service.delete_book(book_id, session)
+    if deleted is None:
         raise BookNotFound()
-    await book_service.delete_book(book_id, session)
     return {}
\ No newline at end of file
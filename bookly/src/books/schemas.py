@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime, date
 import uuid
-from typing import List
+from typing import List, Optional
 from src.reviews.schemas import Review
 
 class Books(BaseModel):
@@ -12,11 +12,21 @@ class Books(BaseModel):
     published_date: date
     page_count: int
     language: str
+    review_count: int = 0
+    rating_sum: int = 0
+    rating_histogram: List[int] = []
+    rating_avg: Optional[float] = None
     created_at: datetime
     updated_at: datetime
 
 class BookDetail(Books):
+    # first page of /books/{book_id}/reviews, newest first
     reviews: List[Review]
+    reviews_next_cursor: Optional[str] = None
+
+class BookPage(BaseModel):
+    books: List[Books]
+    next_cursor: Optional[str] = None
 
 class BookCreateModel(BaseModel):
     title: str
@@ -26,6 +36,16 @@ class BookCreateModel(BaseModel):
     page_count: int
     language: str
 
+class BulkRowError(BaseModel):
+    line: int
+    errors: List[str]
+
+class BulkImportReport(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkRowError]
+    errors_truncated: bool
+
 class BookUpdate(BaseModel):
     title: str
     author: str
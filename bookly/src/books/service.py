@@ -1,30 +1,181 @@
-from datetime import datetime
-from sqlmodel import select, desc
+from datetime import datetime, date
+from typing import AsyncIterator
+import uuid
+from sqlmodel import select, desc, tuple_, func, insert, update
 from sqlmodel.ext.asyncio.session import AsyncSession
 from .schemas import BookCreateModel, BookUpdate
-from src.db.models import Book
+from src.db.models import Book, Review, book_search_vector
+from src.db.pagination import decode_cursor, paginate
+from src.errors import InvalidCursor
+from src.config import Config
+from src.fields import select_columns, select_fields
+from .bulk import build_book_row, describe_error
+
+# read by book_cursor and page_etag in the routes
+PAGE_KEYS = ("uid", "created_at", "updated_at")
+
+def book_cursor(book: Book) -> dict:
+    return {"created_at": book.created_at.isoformat(), "uid": str(book.uid)}
+
+def keyset_after(statement, cursor: str | None):
+    statement = statement.order_by(desc(Book.created_at), desc(Book.uid))
+    if cursor is None:
+        return statement
+    payload = decode_cursor(cursor)
+    try:
+        created_at = datetime.fromisoformat(payload["created_at"])
+        uid = uuid.UUID(payload["uid"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidCursor() from e
+    return statement.where(tuple_(Book.created_at, Book.uid) < tuple_(created_at, uid))
+
+def search_cursor(row) -> dict:
+    uid = row.Book.uid if "Book" in row._mapping else row.uid
+    return {"rank": row.rank, "uid": str(uid)}
+
+def parse_search_cursor(cursor: str) -> tuple[float, uuid.UUID]:
+    payload = decode_cursor(cursor)
+    try:
+        return float(payload["rank"]), uuid.UUID(payload["uid"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidCursor() from e
+
+def search_statement(query_text: str, limit: int, cursor: str | None = None, fields: list[str] | None = None):
+    query = func.websearch_to_tsquery("english", query_text)
+    rank = func.ts_rank_cd(book_search_vector, query)
+    statement = (
+        select(*(select_columns(Book, fields, "uid", "updated_at") if fields else [Book]), rank.label("rank"))
+        .where(book_search_vector.op("@@")(query))
+        .order_by(desc(rank), desc(Book.uid))
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        statement = statement.where(tuple_(rank, Book.uid) < tuple_(*parse_search_cursor(cursor)))
+    return statement
+
+def top_rated_cursor(book: Book) -> dict:
+    return {"rating_avg": book.rating_avg, "review_count": book.review_count, "uid": str(book.uid)}
 
 class BookService:
-    async def get_all_books(self, session: AsyncSession):
-        statement = select(Book).order_by(desc(Book.created_at))
+    async def get_all_books(self, session: AsyncSession, limit: int, cursor: str | None = None, fields: list[str] | None = None):
+        statement = keyset_after(select_fields(Book, fields, *PAGE_KEYS), cursor).limit(limit + 1)
         result = await session.exec(statement)
-        return result.all()
-    async def get_user_books(self, user_id: str, session: AsyncSession):
-        statement = select(Book).where(Book.user_uid == user_id).order_by(desc(Book.created_at))
+        return paginate(result.all(), limit, book_cursor)
+    async def get_user_books(self, user_id: str, session: AsyncSession, limit: int, cursor: str | None = None, fields: list[str] | None = None):
+        statement = keyset_after(select_fields(Book, fields, *PAGE_KEYS).where(Book.user_uid == user_id), cursor).limit(limit + 1)
         result = await session.exec(statement)
-        return result.all()
-    async def get_book(self, book_uid: str, session: AsyncSession):
-        statement = select(Book).where(Book.uid == book_uid)
+        return paginate(result.all(), limit, book_cursor)
+    async def get_book(self, book_uid: str, session: AsyncSession, fields: list[str] | None = None):
+        statement = select_fields(Book, fields, "uid").where(Book.uid == book_uid)
         result = await session.exec(statement)
         return result.first()
+    async def search_books(self, query_text: str, session: AsyncSession, limit: int, cursor: str | None = None, fields: list[str] | None = None):
+        """
+        Ranked full-text search over title, author and publisher using the GIN-indexed
+        search_vector column, paginated on (rank, uid)
+        """
+        statement = search_statement(query_text, limit, cursor, fields)
+        result = await session.exec(statement)
+        rows, next_cursor = paginate(result.all(), limit, search_cursor)
+        if fields:
+            return rows, next_cursor
+        return [row.Book for row in rows], next_cursor
+    async def get_top_rated_books(self, session: AsyncSession, limit: int, min_reviews: int = 1, cursor: str | None = None, fields: list[str] | None = None):
+        """
+        Books by stored average rating, then review count, walking ix_books_rating_avg_review_count_uid
+        backwards; the reviews table isn't touched
+        """
+        statement = (
+            select_fields(Book, fields, "rating_avg", "review_count", "uid", "updated_at")
+            .where(Book.rating_avg.is_not(None), Book.review_count >= min_reviews)
+            .order_by(desc(Book.rating_avg), desc(Book.review_count), desc(Book.uid))
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            payload = decode_cursor(cursor)
+            try:
+                after = (float(payload["rating_avg"]), int(payload["review_count"]), uuid.UUID(payload["uid"]))
+            except (KeyError, TypeError, ValueError) as e:
+                raise InvalidCursor() from e
+            statement = statement.where(tuple_(Book.rating_avg, Book.review_count, Book.uid) < tuple_(*after))
+        result = await session.exec(statement)
+        return paginate(result.all(), limit, top_rated_cursor)
+    async def get_book_version(self, book_uid: str, session: AsyncSession):
+        """
+        Returns (book updated_at, latest review updated_at, review count), which changes
+        whenever the book or any of its reviews does, or None when the book doesn't exist
+        """
+        statement = (
+            select(Book.updated_at, func.max(Review.updated_at), func.count(Review.uid))
+            .select_from(Book)
+            .outerjoin(Review, Review.book_uid == Book.uid)
+            .where(Book.uid == book_uid)
+            .group_by(Book.uid)
+        )
+        result = await session.exec(statement)
+        return result.first()
+    def export_statement(self, since: datetime | None = None):
+        statement = select(*(column for column in Book.__table__.columns if column is not book_search_vector))
+        if since is not None:
+            statement = statement.where(Book.updated_at >= since)
+        return statement
     async def create_book(self, book_data: BookCreateModel, user_id: str, session: AsyncSession):
         book_data_dict = book_data.model_dump()
         new_book = Book(**book_data_dict)
-        new_book.published_date = datetime.strptime(book_data.published_date, "%Y-%m-%d")
+        new_book.published_date = date.fromisoformat(book_data.published_date)
         new_book.user_uid = user_id
         session.add(new_book)
         await session.commit()
         return new_book
+    async def insert_book_rows(self, rows: list[dict], session: AsyncSession):
+        connection = await session.connection()
+        if connection.dialect.driver == "asyncpg":
+            # COPY is several times faster than INSERT for large batches
+            columns = list(rows[0])
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                Book.__tablename__,
+                records=[tuple(row[column] for column in columns) for row in rows],
+                columns=columns
+            )
+            session.info["has_writes"] = True
+        else:
+            await session.exec(insert(Book).values(rows))
+        await session.commit()
+    async def bulk_create_books(self, records: AsyncIterator, user_id: str, session: AsyncSession):
+        """
+        Validates streamed (line number, record, parse error) tuples and inserts the valid ones
+        in batches of BULK_BATCH_SIZE, one transaction per batch
+        """
+        user_uid = uuid.UUID(user_id)
+        report = {"inserted": 0, "failed": 0, "errors": []}
+        batch = []
+
+        def record_failure(line_number: int, errors: list):
+            report["failed"] += 1
+            if len(report["errors"]) < Config.BULK_MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": line_number, "errors": errors})
+
+        async for line_number, record, parse_error in records:
+            if parse_error is not None:
+                record_failure(line_number, [parse_error])
+                continue
+            try:
+                batch.append(build_book_row(record, user_uid, datetime.now()))
+            except ValueError as e:
+                record_failure(line_number, describe_error(e))
+                continue
+            if len(batch) >= Config.BULK_BATCH_SIZE:
+                await self.insert_book_rows(batch, session)
+                report["inserted"] += len(batch)
+                batch = []
+
+        if batch:
+            await self.insert_book_rows(batch, session)
+            report["inserted"] += len(batch)
+
+        report["errors_truncated"] = report["failed"] > len(report["errors"])
+        return report
     async def update_book(self, book_uid: str, update_data: BookUpdate, session: AsyncSession):
         book_to_update = await self.get_book(book_uid, session)
         if book_to_update is not None:
@@ -38,6 +189,8 @@ class BookService:
     async def delete_book(self, book_uid: str, session: AsyncSession):
         book_to_delete = await self.get_book(book_uid, session)
         if book_to_delete is not None:
+            # reviews outlive their book, as before; done in SQL so they aren't loaded first
+            await session.exec(update(Review).where(Review.book_uid == book_to_delete.uid).values(book_uid=None))
             await session.delete(book_to_delete)
             await session.commit()
             return {}
@@ -1,14 +1,49 @@
 from celery import Celery
-from src.mail import mail, create_message
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.config import Config
+from src.mail import mail, create_message, send_batch, retry_delay
+from src.outbox import SEND_EMAIL, drain_outbox
 from asgiref.sync import async_to_sync
 
 celery_app = Celery()
 
 celery_app.config_from_object("src.config")
 
-@celery_app.task()
+# every async_to_sync call runs on a fresh event loop, so the relay can't reuse pooled connections
+relay_engine = create_async_engine(Config.DATABASE_URI, poolclass=NullPool)
+relay_session_maker = async_sessionmaker(bind=relay_engine, class_=AsyncSession, expire_on_commit=False)
+
+@celery_app.task(name=SEND_EMAIL)
 def send_email(recipients: list[str], subject: str, body: str):
     message = create_message(recipients=recipients, subject=subject, body=body)
 
     async_to_sync(mail.send_message)(message)
-    print("Email sent successfully!")
\ No newline at end of file
+    print("Email sent successfully!")
+
+@celery_app.task(bind=True, max_retries=Config.EMAIL_TASK_MAX_RETRIES)
+def send_email_batch(self, messages: list[dict]):
+    """
+    Sends a batch of {recipients, subject, body} emails over a few reused SMTP connections.
+    Messages that keep failing transiently are retried later as a smaller batch.
+    """
+    report = async_to_sync(send_batch)(messages)
+    if report["retry"]:
+        # the relay passes messages as a keyword, and retry() reuses the request's kwargs
+        raise self.retry(kwargs={"messages": report["retry"]}, countdown=retry_delay(self.request.retries))
+    return {"sent": report["sent"], "rejected": len(report["rejected"]), "refused_recipients": len(report["refused_recipients"])}
+
+# the relay hands runs of queued send_email tasks to send_email_batch in one message
+BATCHED_TASKS = {send_email.name: send_email_batch.name}
+
+def publish(task: str, kwargs: dict, task_id: str) -> None:
+    # nobody waits on these results, so don't subscribe to the result backend for each one
+    celery_app.send_task(task, kwargs=kwargs, task_id=task_id, ignore_result=True)
+
+@celery_app.task(ignore_result=True)
+def relay_outbox():
+    """
+    Publishes the tasks the app queued in the outbox table; scheduled by celery beat
+    """
+    return async_to_sync(drain_outbox)(relay_session_maker, publish, Config.OUTBOX_BATCH_SIZE, BATCHED_TASKS)
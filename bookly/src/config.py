@@ -3,6 +3,13 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URI : str
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DATABASE_REPLICA_URIS: str = ""
+    READ_YOUR_WRITES_WINDOW: int = 5
     JWT_SECRET: str
     JWT_ALGORITHM: str
     REDIS_HOST: str = "localhost"
@@ -19,6 +26,30 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
     DOMAIN: str
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_CONCURRENCY: int = 4
+    PAGE_SIZE: int = 20
+    MAX_PAGE_SIZE: int = 100
+    BULK_BATCH_SIZE: int = 1000
+    BULK_MAX_REPORTED_ERRORS: int = 1000
+    EXPORT_BATCH_SIZE: int = 1000
+    BLOCKLIST_PING_INTERVAL: int = 15
+    PRINCIPAL_CACHE_TTL: int = 300
+    PRINCIPAL_LOCAL_CACHE_TTL: int = 5
+    PRINCIPAL_LOCAL_CACHE_SIZE: int = 1024
+    ACCESS_LOG_QUEUE_SIZE: int = 10000
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    QUERY_DEBUG: bool = False
+    QUERY_REPEAT_THRESHOLD: int = 3
+    OUTBOX_RELAY_INTERVAL: float = 2.0
+    OUTBOX_BATCH_SIZE: int = 100
+    EMAIL_SMTP_CONNECTIONS: int = 4
+    EMAIL_DOMAIN_RATE: float = 10.0
+    EMAIL_DOMAIN_BURST: int = 20
+    EMAIL_MAX_ATTEMPTS: int = 3
+    EMAIL_RETRY_DELAY: float = 1.0
+    EMAIL_RETRY_MAX_DELAY: float = 60.0
+    EMAIL_TASK_MAX_RETRIES: int = 5
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -26,4 +57,8 @@ Config = Settings()
 
 broker_url = Config.REDIS_URL
 result_backend = Config.REDIS_URL
-broker_connection_retry_on_startup = True
\ No newline at end of file
+broker_connection_retry_on_startup = True
+# run with `celery -A src.celery_tasks beat` next to the worker
+beat_schedule = {
+    "relay-outbox": {"task": "src.celery_tasks.relay_outbox", "schedule": Config.OUTBOX_RELAY_INTERVAL}
+}
\ No newline at end of file
@@ -0,0 +1,73 @@
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Literal
+from contextlib import aclosing
+from datetime import date, datetime
+import csv
+import io
+import json
+import uuid
+from src.config import Config
+from src.db.main import read_session_maker
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Cannot export value of type {type(value).__name__}")
+
+def encode_csv_value(value):
+    if isinstance(value, (datetime, date, uuid.UUID)):
+        return encode_value(value)
+    # e.g. rating_histogram, one JSON array per cell
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=encode_value)
+    return value
+
+def encode_rows(rows, columns: list[str], export_format: ExportFormat) -> bytes:
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([encode_csv_value(value) for value in row] for row in rows)
+        return buffer.getvalue().encode()
+    return "".join(json.dumps(dict(zip(columns, row)), default=encode_value) + "\n" for row in rows).encode()
+
+def as_local_time(value: datetime | None) -> datetime | None:
+    # the timestamp columns hold naive local time, and asyncpg won't compare them with an aware value
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+async def stream_rows(statement, export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """
+    Streams the rows of a column-only select through a server-side cursor, EXPORT_BATCH_SIZE rows at a time.
+    The session is opened here rather than taken from get_session, because a dependency's
+    session is closed before a StreamingResponse body starts.
+    The first chunk (the CSV header, or nothing) is yielded once the query has started
+    """
+    async with read_session_maker()() as session:
+        result = await session.stream(statement.execution_options(yield_per=Config.EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        yield encode_rows([columns], columns, export_format) if export_format == "csv" else b""
+        async for rows in result.partitions():
+            yield encode_rows(rows, columns, export_format)
+
+async def resume(first: bytes, body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    async with aclosing(body):
+        yield first
+        async for chunk in body:
+            yield chunk
+
+async def export_response(statement, export_format: ExportFormat, filename: str) -> StreamingResponse:
+    body = stream_rows(statement, export_format)
+    # start the query before the status line goes out, so its errors still become error responses
+    first = await anext(body)
+    return StreamingResponse(
+        resume(first, body),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
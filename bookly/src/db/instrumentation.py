@@ -0,0 +1,83 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+from src.config import Config
+
+logger = logging.getLogger("bookly.queries")
+
+class QueryStats:
+    """
+    Statements run on behalf of one request. With `track_statements` (QUERY_DEBUG) it also
+    remembers each statement's SQL and parameters to spot N+1 loads and duplicate fetches.
+    """
+    def __init__(self, track_statements: bool = False):
+        self.count = 0
+        self.duration = 0.0
+        self.track_statements = track_statements
+        self.by_sql = Counter()
+        self.by_sql_and_params = Counter()
+
+    def record(self, statement: str, parameters, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        if self.track_statements:
+            self.by_sql[statement] += 1
+            self.by_sql_and_params[(statement, repr(parameters))] += 1
+
+    def duplicates(self) -> list[str]:
+        # the very same statement and parameters, i.e. a row fetched again
+        return [statement for (statement, _), count in self.by_sql_and_params.items() if count > 1]
+
+    def repeated(self, threshold: int) -> list[str]:
+        # the same statement with different parameters, i.e. a per-row (N+1) load
+        return [statement for statement, count in self.by_sql.items() if count >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+def record_statement(statement: str, parameters, duration: float) -> None:
+    """
+    Called for every statement by the engine hooks in src/metrics.py
+    """
+    stats = current_stats.get()
+    if stats is not None:
+        stats.record(statement, parameters, duration)
+
+@contextmanager
+def capture_queries(track_statements: bool = Config.QUERY_DEBUG):
+    """
+    Collects the statements run inside the block (and the tasks it starts) into a QueryStats
+    """
+    stats = QueryStats(track_statements)
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+
+def report_repeats(stats: QueryStats, route: str | None) -> dict:
+    if not stats.track_statements:
+        return {}
+    duplicates = stats.duplicates()
+    repeated = stats.repeated(Config.QUERY_REPEAT_THRESHOLD)
+    for statement in duplicates:
+        logger.warning("duplicate query in %s: %s", route, statement)
+    for statement in repeated:
+        logger.warning("query repeated %d times in %s (N+1?): %s", stats.by_sql[statement], route, statement)
+    return {"db_duplicates": len(duplicates), "db_repeated": len(repeated)}
+
+def queries_in(response) -> int:
+    """
+    Number of queries a response reports in its Server-Timing header, for query budget tests:
+        assert queries_in(client.get("/api/v1/books/")) <= 2
+    """
+    for metric in response.headers.get("server-timing", "").split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        if name == "db":
+            for param in params:
+                if param.startswith("desc="):
+                    return int(param.removeprefix("desc=").strip('"').split()[0])
+    raise AssertionError("response has no db Server-Timing entry")
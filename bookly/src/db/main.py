@@ -1,20 +1,114 @@
-from sqlmodel import create_engine, SQLModel
+from fastapi import Request
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.ext.asyncio import AsyncEngine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import itertools
+import time
 from src.config import Config
+from src.db.redis import mark_recent_write, has_recent_write
+from src.metrics import DB_POOL_CHECKOUT_WAIT, instrument_engine
 
-engine = AsyncEngine(
-    create_engine(url=Config.DATABASE_URI)
-)
+checkout_stats = {"checkouts": 0, "total_wait": 0.0, "max_wait": 0.0}
 
-async def init_db() -> None:
-    async with engine.begin() as conn:
-        from src.db.models import Book
-        await conn.run_sync(SQLModel.metadata.create_all)
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waited for a connection
+    """
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            checkout_stats["checkouts"] += 1
+            checkout_stats["total_wait"] += waited
+            checkout_stats["max_wait"] = max(checkout_stats["max_wait"], waited)
+            DB_POOL_CHECKOUT_WAIT.observe(waited)
 
-async def get_session() -> AsyncSession: # pyright: ignore[reportInvalidTypeForm]
-    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+def build_engine(url: str, name: str):
+    engine = create_async_engine(
+        url=url,
+        poolclass=TimedQueuePool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=Config.DB_POOL_PRE_PING
+    )
+    instrument_engine(engine, name)
+    return engine
 
-    async with Session() as session:
-        yield session
\ No newline at end of file
+engine = build_engine(Config.DATABASE_URI, "primary")
+
+async_session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+replica_urls = [url.strip() for url in Config.DATABASE_REPLICA_URIS.split(",") if url.strip()]
+replica_engines = [build_engine(url, f"replica-{i}") for i, url in enumerate(replica_urls, 1)]
+replica_session_makers = [
+    async_sessionmaker(bind=replica, class_=AsyncSession, expire_on_commit=False) for replica in replica_engines
+]
+replica_cycle = itertools.cycle(replica_session_makers)
+
+@event.listens_for(Session, "after_flush")
+def flag_flush(session, flush_context):
+    session.info["has_writes"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def flag_dml(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["has_writes"] = True
+
+def request_user_uid(request: Request) -> str | None:
+    context = getattr(request.state, "auth_context", None)
+    if context is None:
+        return None
+    return context.token_data.get("user", {}).get("user_uid")
+
+async def close_db() -> None:
+    await engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
+
+async def get_session(request: Request) -> AsyncSession: # pyright: ignore[reportInvalidTypeForm]
+    async with async_session_maker() as session:
+        yield session
+
+        # remember who just wrote so their follow-up reads stay on the primary
+        if replica_session_makers and session.info.get("has_writes"):
+            user_uid = request_user_uid(request)
+            if user_uid is not None:
+                await mark_recent_write(user_uid)
+
+def read_session_maker() -> async_sessionmaker:
+    return next(replica_cycle) if replica_session_makers else async_session_maker
+
+async def get_read_session(request: Request) -> AsyncSession: # pyright: ignore[reportInvalidTypeForm]
+    """
+    Session for read-only routes: goes to a replica (round robin) unless the caller
+    wrote something within the last READ_YOUR_WRITES_WINDOW seconds.
+    Declare it after the auth dependencies so the caller is already known.
+    """
+    session_maker = async_session_maker
+    if replica_session_makers:
+        user_uid = request_user_uid(request)
+        if user_uid is None or not await has_recent_write(user_uid):
+            session_maker = read_session_maker()
+
+    async with session_maker() as session:
+        yield session
+
+def get_pool_stats() -> dict:
+    pool = engine.pool
+    checkouts = checkout_stats["checkouts"]
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "checkouts": checkouts,
+        "avg_wait_ms": checkout_stats["total_wait"] / checkouts * 1000 if checkouts else 0.0,
+        "max_wait_ms": checkout_stats["max_wait"] * 1000
+    }
@@ -1,11 +1,18 @@
 from sqlmodel import SQLModel, Field, Column, Relationship
+from sqlalchemy import Computed, Index
 import sqlalchemy.dialects.postgresql as pg
 from datetime import datetime, date
 import uuid
 from typing import Optional, List
 
+# ratings run from 0 to RATING_BUCKETS - 1, one histogram bucket each
+RATING_BUCKETS = 5
+
 class User(SQLModel, table= True):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_email", "email", unique=True),
+    )
     uid: uuid.UUID = Field(
         sa_column=Column(
             pg.UUID,
@@ -22,13 +29,14 @@ class User(SQLModel, table= True):
     created_at: datetime = Field(
         sa_column=Column(
             pg.TIMESTAMP, 
-            default=datetime.now()
+            default=datetime.now
         )
     )
     updated_at: datetime = Field(
         sa_column=Column(
             pg.TIMESTAMP, 
-            default=datetime.now()
+            default=datetime.now,
+            onupdate=datetime.now
         )
     )
     is_verified: bool = Field(default=False)
@@ -38,14 +46,30 @@ class User(SQLModel, table= True):
             nullable=False,
             server_default="user"
         ))
-    books: List["Book"] = Relationship(back_populates="user", sa_relationship_kwargs={"lazy": "selectin"})
-    reviews: List["Review"] = Relationship(back_populates="user", sa_relationship_kwargs={"lazy": "selectin"})
+    token_version: int = Field(
+        default=0,
+        sa_column=Column(
+            pg.INTEGER,
+            nullable=False,
+            server_default="0"
+        ))
+    # loaded explicitly with selectinload() where needed (see UserService.get_user_by_email)
+    books: List["Book"] = Relationship(back_populates="user")
+    reviews: List["Review"] = Relationship(back_populates="user")
 
     def __repr__(self):
         return f"<User ({self.username})>"
 
 class Book(SQLModel, table=True):
     __tablename__ = "books"
+    __table_args__ = (
+        # keyset pagination of the catalog and of a user's submissions
+        Index("ix_books_created_at_uid", "created_at", "uid"),
+        Index("ix_books_user_uid_created_at_uid", "user_uid", "created_at", "uid"),
+        Index("ix_books_updated_at", "updated_at"),
+        # /books/top-rated
+        Index("ix_books_rating_avg_review_count_uid", "rating_avg", "review_count", "uid"),
+    )
     uid: uuid.UUID = Field(
         sa_column= Column(
             pg.UUID,
@@ -64,26 +88,73 @@ class Book(SQLModel, table=True):
         default=None,
         foreign_key="users.uid"
     )
+    # rating aggregates, maintained by ReviewService alongside every review insert/delete
+    review_count: int = Field(
+        default=0,
+        sa_column=Column(
+            pg.INTEGER,
+            nullable=False,
+            server_default="0"
+        ))
+    rating_sum: int = Field(
+        default=0,
+        sa_column=Column(
+            pg.INTEGER,
+            nullable=False,
+            server_default="0"
+        ))
+    rating_histogram: List[int] = Field(
+        default_factory=lambda: [0] * RATING_BUCKETS,
+        sa_column=Column(
+            pg.ARRAY(pg.INTEGER, zero_indexes=True),
+            nullable=False,
+            server_default="{" + ",".join("0" * RATING_BUCKETS) + "}"
+        ))
+    rating_avg: Optional[float] = Field(
+        default=None,
+        sa_column=Column(
+            pg.DOUBLE_PRECISION,
+            nullable=True
+        ))
     created_at: datetime = Field(
         sa_column= Column(
             pg.TIMESTAMP, 
-            default=datetime.now()
+            default=datetime.now
         )
     )
     updated_at: datetime = Field(
         sa_column= Column(
             pg.TIMESTAMP, 
-            default=datetime.now()
+            default=datetime.now,
+            onupdate=datetime.now
         )
     )
     user: Optional["User"] = Relationship(back_populates="books")
-    reviews: Optional[List["Review"]] = Relationship(back_populates="book", sa_relationship_kwargs={"lazy": "selectin"})
+    # paged through ReviewService.get_book_reviews; BookService.delete_book detaches reviews itself
+    reviews: Optional[List["Review"]] = Relationship(back_populates="book", sa_relationship_kwargs={"passive_deletes": True})
 
     def __repr__(self):
         return f"<Book(title={self.title})>"
+
+# Full-text search document, generated by Postgres. It is appended to the table after mapping
+# so it is created with the table and usable in queries, but never loaded with a Book.
+book_search_vector = Column(
+    "search_vector",
+    pg.TSVECTOR,
+    Computed("to_tsvector('english', coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || coalesce(publisher, ''))", persisted=True)
+)
+Book.__table__.append_column(book_search_vector)
+Index("ix_books_search_vector", book_search_vector, postgresql_using="gin")
     
 class Review(SQLModel, table=True):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # /books/{book_id}/reviews, newest first and highest rating first
+        Index("ix_reviews_book_uid_created_at_uid", "book_uid", "created_at", "uid"),
+        Index("ix_reviews_book_uid_rating_created_at_uid", "book_uid", "rating", "created_at", "uid"),
+        Index("ix_reviews_user_uid", "user_uid"),
+        Index("ix_reviews_updated_at", "updated_at"),
+    )
     uid: uuid.UUID = Field(
         sa_column= Column(
             pg.UUID,
@@ -105,17 +176,46 @@ class Review(SQLModel, table=True):
     created_at: datetime = Field(
         sa_column= Column(
             pg.TIMESTAMP, 
-            default=datetime.now()
+            default=datetime.now
         )
     )
     updated_at: datetime = Field(
         sa_column= Column(
             pg.TIMESTAMP, 
-            default=datetime.now()
+            default=datetime.now,
+            onupdate=datetime.now
         )
     )
     user: Optional["User"] = Relationship(back_populates="reviews")
     book: Optional["Book"] = Relationship(back_populates="reviews")
 
     def __repr__(self):
-        return f"<Review for book ({self.book_uid}) by user ({self.user_uid})>"
\ No newline at end of file
+        return f"<Review for book ({self.book_uid}) by user ({self.user_uid})>"
+
+class OutboxMessage(SQLModel, table=True):
+    """
+    A Celery task waiting to be published, written in the same transaction as the change
+    that caused it (see src/outbox.py)
+    """
+    __tablename__ = "outbox"
+    id: Optional[int] = Field(
+        default=None,
+        sa_column=Column(
+            pg.BIGINT,
+            primary_key=True,
+            autoincrement=True
+        ))
+    task: str
+    payload: dict = Field(
+        sa_column=Column(
+            pg.JSONB,
+            nullable=False
+        ))
+    created_at: datetime = Field(
+        sa_column=Column(
+            pg.TIMESTAMP,
+            default=datetime.now
+        ))
+
+    def __repr__(self):
+        return f"<OutboxMessage ({self.task})>"
@@ -0,0 +1,29 @@
+import base64
+import json
+from src.errors import InvalidCursor
+
+
+def encode_cursor(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor() from e
+
+    if not isinstance(payload, dict):
+        raise InvalidCursor()
+    return payload
+
+def paginate(rows: list, limit: int, cursor_for) -> tuple[list, str | None]:
+    """
+    Takes the `limit + 1` rows fetched by a keyset query and splits them into the page
+    and the cursor for the next page (None when this is the last page)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(cursor_for(page[-1]))
@@ -1,7 +1,17 @@
 import redis.asyncio as aioredis
+from collections import OrderedDict
+import asyncio
+import json
+import logging
+import time
 from src.config import Config
+from src.metrics import REDIS_COMMAND_LATENCY, PRINCIPAL_CACHE_LOOKUPS
 
 JTI_EXPIRY = 3600
+BLOCKLIST_INDEX = "blocklist:index"
+BLOCKLIST_CHANNEL = "blocklist:events"
+# revoked JTIs (uuid4 strings) are stored as plain keys named after the JTI
+JTI_KEY_PATTERN = "????????-????-????-????-????????????"
 
 # token_blocklist = aioredis.StrictRedis(
 #     host=Config.REDIS_HOST,
@@ -9,18 +19,233 @@ JTI_EXPIRY = 3600
 #     db=0
 # )
 
-token_blocklist = aioredis.from_url(
+class TimedRedis(aioredis.Redis):
+    """
+    Redis client that records the latency of every command it sends
+    """
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_LATENCY.labels(str(args[0]).upper()).observe(time.perf_counter() - start)
+
+token_blocklist = TimedRedis.from_url(
     Config.REDIS_URL
 )
 
-async def add_jti_to_blocklist(jti: str) -> None:
+class LocalBlocklist:
+    """
+    In-process mirror of the revoked JTIs. It subscribes to BLOCKLIST_CHANNEL, then loads
+    the current entries from the BLOCKLIST_INDEX sorted set (score = expiry timestamp).
+    While the subscription is healthy, lookups are answered from memory. When it is not,
+    `synced` is False and callers fall back to Redis.
+    """
+    def __init__(self, client, channel: str, index: str):
+        self.client = client
+        self.channel = channel
+        self.index = index
+        self.backfilled_marker = f"{index}:backfilled"
+        self.entries: dict[str, float] = {}
+        self.synced = False
+        self.task: asyncio.Task | None = None
+
+    def add(self, jti: str, expires_at: float) -> None:
+        self.entries[jti] = expires_at
+
+    def contains(self, jti: str) -> bool:
+        expires_at = self.entries.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at < time.time():
+            del self.entries[jti]
+            return False
+        return True
+
+    def purge(self) -> None:
+        now = time.time()
+        for jti in [jti for jti, expires_at in self.entries.items() if expires_at < now]:
+            del self.entries[jti]
+
+    async def backfill(self) -> None:
+        """
+        Adds the JTIs revoked before the index existed, found by scanning for their keys. Runs
+        at every bootstrap until one completes and sets the marker, so no old revocation is
+        missing from the mirror once it takes over from the Redis lookups.
+        """
+        if await self.client.exists(self.backfilled_marker):
+            return
+        now = time.time()
+        entries = {}
+        async for key in self.client.scan_iter(match=JTI_KEY_PATTERN, count=1000):
+            ttl = await self.client.ttl(key)
+            if ttl == -2:
+                continue
+            entries[key] = now + (ttl if ttl > 0 else JTI_EXPIRY)
+        if entries:
+            await self.client.zadd(self.index, entries)
+        await self.client.set(self.backfilled_marker, "")
+
+    async def bootstrap(self) -> None:
+        await self.backfill()
+        now = time.time()
+        await self.client.zremrangebyscore(self.index, "-inf", now)
+        for jti, expires_at in await self.client.zrangebyscore(self.index, now, "+inf", withscores=True):
+            self.add(jti.decode() if isinstance(jti, bytes) else jti, expires_at)
+
+    async def listen(self) -> None:
+        backoff = 1
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                await self.bootstrap()
+                self.synced = True
+                backoff = 1
+                last_ping = time.monotonic()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None and message["type"] == "message":
+                        event = json.loads(message["data"])
+                        self.add(event["jti"], event["expires_at"])
+                    if time.monotonic() - last_ping > Config.BLOCKLIST_PING_INTERVAL:
+                        # a dead subscription stays silent, so probe it and purge while we are at it
+                        await pubsub.ping()
+                        self.purge()
+                        last_ping = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning("blocklist subscription lost, falling back to Redis lookups: %s", e)
+                self.synced = False
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                await pubsub.aclose()
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.listen())
+
+    async def stop(self) -> None:
+        self.synced = False
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+local_blocklist = LocalBlocklist(token_blocklist, BLOCKLIST_CHANNEL, BLOCKLIST_INDEX)
+
+async def add_jti_to_blocklist(jti: str, expires_at: float | None = None) -> None:
+    # only keep the entry for as long as the token itself would still be accepted
+    if expires_at is None:
+        expires_at = time.time() + JTI_EXPIRY
+    ttl = max(int(expires_at - time.time()) + 1, 1)
     await token_blocklist.set(
         name=jti,
         value="",
-        ex=JTI_EXPIRY
+        ex=ttl
     )
+    await token_blocklist.zadd(BLOCKLIST_INDEX, {jti: expires_at})
+    local_blocklist.add(jti, expires_at)
+    await token_blocklist.publish(BLOCKLIST_CHANNEL, json.dumps({"jti": jti, "expires_at": expires_at}))
 
 async def token_in_blocklist(jti: str) -> bool:
+    if local_blocklist.synced:
+        return local_blocklist.contains(jti)
+
     jti = await token_blocklist.get(jti)
 
-    return jti is not None
\ No newline at end of file
+    return jti is not None
+
+RECENT_WRITE_PREFIX = "recent_write:"
+recent_writes: dict[str, float] = {}
+
+async def mark_recent_write(user_uid: str) -> None:
+    recent_writes[user_uid] = time.monotonic() + Config.READ_YOUR_WRITES_WINDOW
+    await token_blocklist.set(
+        name=RECENT_WRITE_PREFIX + user_uid,
+        value="",
+        ex=Config.READ_YOUR_WRITES_WINDOW
+    )
+
+async def has_recent_write(user_uid: str) -> bool:
+    expires_at = recent_writes.get(user_uid)
+    if expires_at is not None:
+        if expires_at > time.monotonic():
+            return True
+        del recent_writes[user_uid]
+
+    # the write may have landed on another worker
+    return await token_blocklist.exists(RECENT_WRITE_PREFIX + user_uid) > 0
+
+class PrincipalCache:
+    """
+    Caches the auth principal (uid, email, role, is_verified, token_version) of a user in Redis,
+    keyed by user uid, with a small per-process LRU in front of it. Entries in the local LRU live
+    for a few seconds only, which bounds how stale another worker can be after an invalidation.
+    Lookups are counted in PRINCIPAL_CACHE_LOOKUPS as local_hit, redis_hit or miss.
+    """
+    prefix = "principal:"
+
+    def __init__(self, client, ttl: int, local_ttl: int, local_size: int):
+        self.client = client
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self.local: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    def _get_local(self, uid: str) -> dict | None:
+        entry = self.local.get(uid)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at < time.monotonic():
+            del self.local[uid]
+            return None
+        self.local.move_to_end(uid)
+        return principal
+
+    def _set_local(self, uid: str, principal: dict) -> None:
+        self.local[uid] = (time.monotonic() + self.local_ttl, principal)
+        self.local.move_to_end(uid)
+        while len(self.local) > self.local_size:
+            self.local.popitem(last=False)
+
+    async def get(self, uid: str) -> dict | None:
+        principal = self._get_local(uid)
+        if principal is not None:
+            PRINCIPAL_CACHE_LOOKUPS.labels("local_hit").inc()
+            return principal
+
+        cached = await self.client.get(self.prefix + uid)
+        if cached is None:
+            PRINCIPAL_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+
+        PRINCIPAL_CACHE_LOOKUPS.labels("redis_hit").inc()
+        principal = json.loads(cached)
+        self._set_local(uid, principal)
+        return principal
+
+    async def set(self, uid: str, principal: dict) -> None:
+        self._set_local(uid, principal)
+        await self.client.set(
+            name=self.prefix + uid,
+            value=json.dumps(principal, default=str),
+            ex=self.ttl
+        )
+
+    async def invalidate(self, uid: str) -> None:
+        self.local.pop(uid, None)
+        await self.client.delete(self.prefix + uid)
+
+principal_cache = PrincipalCache(
+    token_blocklist,
+    ttl=Config.PRINCIPAL_CACHE_TTL,
+    local_ttl=Config.PRINCIPAL_LOCAL_CACHE_TTL,
+    local_size=Config.PRINCIPAL_LOCAL_CACHE_SIZE
+)
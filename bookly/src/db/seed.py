@@ -0,0 +1,242 @@
+"""
+Generates a large, reproducible catalog and bulk-loads it with COPY:
+
+    python -m src.db.seed --reset --users 100000 --books 1000000 --reviews 5000000 [--seed 0]
+
+Activity is skewed the way a real catalog's is: a few prolific users submit and review most of
+the books, authors follow a long tail, and review counts per book are Zipf distributed, so a
+handful of books carry most of the reviews while most have one or none. The same --seed always
+produces the same rows. Every seeded user is user<N>@example.com with the password SEED_PASSWORD.
+"""
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Iterator
+import argparse
+import asyncio
+import bisect
+import itertools
+import random
+import sys
+import time
+import uuid
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from src.db.models import RATING_BUCKETS
+
+SEED_PASSWORD = "seeded-password"
+
+USER_COLUMNS = (
+    "uid", "username", "email", "password", "first_name", "last_name",
+    "is_verified", "role", "token_version", "created_at", "updated_at"
+)
+BOOK_COLUMNS = (
+    "uid", "title", "author", "publisher", "published_date", "page_count", "language", "user_uid",
+    "review_count", "rating_sum", "rating_histogram", "rating_avg", "created_at", "updated_at"
+)
+REVIEW_COLUMNS = ("uid", "rating", "review_text", "user_uid", "book_uid", "created_at", "updated_at")
+
+# every timestamp falls in the five years before END, so runs don't depend on the clock
+END = datetime(2025, 1, 1)
+START = END - timedelta(days=5 * 365)
+
+FIRST_NAMES = ["Ada", "Ben", "Chloe", "Dev", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jonas", "Kemi", "Liam", "Mei", "Noor"]
+LAST_NAMES = ["Adams", "Brown", "Chen", "Diaz", "Evans", "Fischer", "Garcia", "Haddad", "Ito", "Jensen", "Khan", "Lopez", "Moreau", "Novak"]
+TITLE_WORDS = [
+    "Shadow", "River", "Empire", "Garden", "Winter", "Silence", "Stars", "Kingdom", "Memory", "Ocean",
+    "Iron", "Glass", "Night", "Harvest", "Storm", "Letters", "Mountain", "City", "Fire", "Secret"
+]
+PUBLISHERS = ["Penguin", "HarperCollins", "Macmillan", "Hachette", "Simon & Schuster", "Vintage", "Tor", "Faber & Faber"]
+# (language, weight)
+LANGUAGES = [("English", 70), ("Spanish", 8), ("French", 6), ("German", 5), ("Japanese", 4), ("Italian", 4), ("Portuguese", 3)]
+REVIEW_TEXTS = [
+    "Could not put it down.", "Slow start, great ending.", "Not for me.", "Beautifully written.",
+    "Overhyped.", "A classic for a reason.", "The middle drags.", "Read it twice already."
+]
+
+class ZipfSampler:
+    """
+    Draws indexes 0..n-1 with probability proportional to 1 / rank ** exponent.
+    Ranks are shuffled over the indexes, so the popular ones aren't simply the first.
+    """
+    def __init__(self, n: int, exponent: float, rng: random.Random):
+        self.cumulative = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
+        self.by_rank = list(range(n))
+        rng.shuffle(self.by_rank)
+        self.rng = rng
+
+    def draw(self) -> int:
+        rank = bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+        return self.by_rank[rank]
+
+def random_uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+def random_time(rng: random.Random, after: datetime) -> datetime:
+    return after + timedelta(seconds=rng.randrange(max(1, int((END - after).total_seconds()))))
+
+def generate_users(count: int, password_hash: str, rng: random.Random) -> list[tuple]:
+    users = []
+    for i in range(count):
+        created_at = random_time(rng, START)
+        users.append((
+            random_uuid(rng), f"user{i}", f"user{i}@example.com", password_hash,
+            rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), True, "user", 0, created_at, created_at
+        ))
+    return users
+
+def review_counts(book_count: int, review_count: int, exponent: float, rng: random.Random) -> array:
+    counts = array("I", [0]) * book_count
+    books = ZipfSampler(book_count, exponent, rng)
+    for _ in range(review_count):
+        counts[books.draw()] += 1
+    return counts
+
+def generate_catalog(
+    users: list[tuple], book_count: int, review_count: int, rng: random.Random,
+    batch_size: int = 10_000, user_skew: float = 1.1, review_skew: float = 1.0
+) -> Iterator[tuple[list[tuple], list[tuple]]]:
+    """
+    Yields (book rows, review rows) in batches of batch_size books together with all of their
+    reviews, so the rating aggregates on each book row match the reviews loaded with it
+    """
+    submitters = ZipfSampler(len(users), user_skew, rng)
+    reviewers = ZipfSampler(len(users), user_skew, rng)
+    authors = ZipfSampler(max(1, book_count // 5), user_skew, rng)
+    counts = review_counts(book_count, review_count, review_skew, rng)
+    languages, language_weights = zip(*LANGUAGES)
+    uid, created = USER_COLUMNS.index("uid"), USER_COLUMNS.index("created_at")
+
+    books, reviews = [], []
+    for i in range(book_count):
+        owner = users[submitters.draw()]
+        book_uid = random_uuid(rng)
+        created_at = random_time(rng, owner[created])
+        # some books are simply better liked than others
+        quality = rng.gauss(2.8, 0.7)
+        histogram = [0] * RATING_BUCKETS
+        for _ in range(counts[i]):
+            reviewer = users[reviewers.draw()]
+            rating = min(RATING_BUCKETS - 1, max(0, round(rng.gauss(quality, 1.0))))
+            histogram[rating] += 1
+            reviewed_at = random_time(rng, max(created_at, reviewer[created]))
+            reviews.append((
+                random_uuid(rng), rating, rng.choice(REVIEW_TEXTS), reviewer[uid], book_uid, reviewed_at, reviewed_at
+            ))
+        rating_sum = sum(rating * count for rating, count in enumerate(histogram))
+        books.append((
+            book_uid,
+            " ".join(rng.sample(TITLE_WORDS, rng.randint(1, 3))) + f" {i}",
+            f"Author {authors.draw()}",
+            rng.choice(PUBLISHERS),
+            date(1900, 1, 1) + timedelta(days=rng.randrange(125 * 365)),
+            max(40, int(rng.lognormvariate(5.7, 0.4))),
+            rng.choices(languages, language_weights)[0],
+            owner[uid],
+            counts[i],
+            rating_sum,
+            histogram,
+            rating_sum / counts[i] if counts[i] else None,
+            created_at,
+            created_at
+        ))
+        if len(books) >= batch_size:
+            yield books, reviews
+            books, reviews = [], []
+    if books:
+        yield books, reviews
+
+async def copy_rows(connection: AsyncConnection, table: str, columns: tuple, rows: list[tuple]) -> None:
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(table, records=rows, columns=list(columns))
+
+async def drop_secondary_structures(connection: AsyncConnection) -> list[str]:
+    """
+    Drops the foreign keys and non-primary-key indexes of the seeded tables and returns the
+    statements that recreate them. Building an index once over the loaded rows is much
+    cheaper than maintaining it (and checking every foreign key) row by row during COPY.
+    """
+    tables = ["users", "books", "reviews"]
+    constraints = (await connection.execute(text(
+        "SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE contype = 'f' AND conrelid::regclass::text = ANY(:tables)"
+    ), {"tables": tables})).all()
+    indexes = (await connection.execute(text(
+        "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+        "JOIN pg_index x ON x.indexrelid = (quote_ident(i.schemaname) || '.' || quote_ident(i.indexname))::regclass "
+        "WHERE i.schemaname = current_schema() AND i.tablename = ANY(:tables) AND NOT x.indisprimary"
+    ), {"tables": tables})).all()
+
+    for table, name, _ in constraints:
+        await connection.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+    for name, _ in indexes:
+        await connection.execute(text(f'DROP INDEX "{name}"'))
+    return [definition for _, definition in indexes] + [
+        f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}' for table, name, definition in constraints
+    ]
+
+async def seed_catalog(
+    engine: AsyncEngine, users: int, books: int, reviews: int, seed: int = 0, password_hash: str | None = None,
+    batch_size: int = 10_000, user_skew: float = 1.1, review_skew: float = 1.0
+) -> dict:
+    """
+    Loads the generated catalog into the (empty) users, books and reviews tables in one
+    transaction, rebuilding their indexes and foreign keys afterwards, and ANALYZEs them.
+    Only works on asyncpg engines, which provide COPY.
+    """
+    if password_hash is None:
+        from src.auth.utils import pwd_context
+        password_hash = pwd_context.hash(SEED_PASSWORD)
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        recreate = await drop_secondary_structures(conn)
+        user_rows = generate_users(users, password_hash, rng)
+        await copy_rows(conn, "users", USER_COLUMNS, user_rows)
+        for book_rows, review_rows in generate_catalog(
+            user_rows, books, reviews, rng, batch_size=batch_size, user_skew=user_skew, review_skew=review_skew
+        ):
+            await copy_rows(conn, "books", BOOK_COLUMNS, book_rows)
+            await copy_rows(conn, "reviews", REVIEW_COLUMNS, review_rows)
+        for statement in recreate:
+            await conn.execute(text(statement))
+    async with engine.connect() as conn:
+        await conn.execute(text("ANALYZE users, books, reviews"))
+        await conn.commit()
+    return {"users": users, "books": books, "reviews": reviews, "seconds": round(time.perf_counter() - started, 2)}
+
+async def reset_tables(engine: AsyncEngine) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text("TRUNCATE reviews, books, users"))
+
+async def run(args) -> dict:
+    from src.db.main import engine
+
+    try:
+        await reset_tables(engine)
+        return await seed_catalog(
+            engine, args.users, args.books, args.reviews, seed=args.seed,
+            batch_size=args.batch_size, user_skew=args.user_skew, review_skew=args.review_skew
+        )
+    finally:
+        await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reset", action="store_true", help="confirm that the users, books and reviews tables may be emptied")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--reviews", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=10_000, help="books per COPY batch")
+    parser.add_argument("--user-skew", type=float, default=1.1, help="Zipf exponent of submissions and reviews per user")
+    parser.add_argument("--review-skew", type=float, default=1.0, help="Zipf exponent of reviews per book")
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error("this empties the users, books and reviews tables in DATABASE_URI; pass --reset to confirm")
+
+    summary = asyncio.run(run(args))
+    print(f"loaded {summary['users']} users, {summary['books']} books and {summary['reviews']} reviews in {summary['seconds']}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
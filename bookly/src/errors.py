@@ -1,6 +1,6 @@
 from fastapi import status, FastAPI
 from fastapi.requests import Request
-from fastapi.responses import JSONResponse
+from src.responses import ORJSONResponse
 from typing import Any, Callable
 
 
@@ -76,9 +76,21 @@ class AccountNotVerified(BooklyException):
     """
     pass
 
-def create_exception_handler(status_code: int, initial_detail: Any) -> Callable[[Request, Exception], JSONResponse]:
-    async def exception_handler(request: Request, exception: BooklyException) -> JSONResponse:
-        return JSONResponse(status_code=status_code, content=initial_detail)
+class InvalidCursor(BooklyException):
+    """
+    User has provided a pagination cursor that is malformed or was not issued by us
+    """
+    pass
+
+class InvalidFields(BooklyException):
+    """
+    User has asked for a field the resource doesn't have
+    """
+    pass
+
+def create_exception_handler(status_code: int, initial_detail: Any) -> Callable[[Request, Exception], ORJSONResponse]:
+    async def exception_handler(request: Request, exception: BooklyException) -> ORJSONResponse:
+        return ORJSONResponse(status_code=status_code, content=initial_detail)
 
     return exception_handler
 
@@ -129,9 +141,19 @@ def register_all_errors(app: FastAPI):
         create_exception_handler(status_code=status.HTTP_403_FORBIDDEN, initial_detail={"message": "Account not verified", "error_code": "ACCOUNT_NOT_VERIFIED", "resolution": "Please verify your account"})
     )
 
+    app.add_exception_handler(
+        InvalidCursor,
+        create_exception_handler(status_code=status.HTTP_400_BAD_REQUEST, initial_detail={"message": "Invalid pagination cursor", "error_code": "INVALID_CURSOR", "resolution": "Please restart from the first page"})
+    )
+
+    app.add_exception_handler(
+        InvalidFields,
+        create_exception_handler(status_code=status.HTTP_400_BAD_REQUEST, initial_detail={"message": "Unknown field requested", "error_code": "INVALID_FIELDS", "resolution": "Please only request fields of the resource"})
+    )
+
     @app.exception_handler(500)
     async def server_error_handler(request, exc):
-        return JSONResponse(
+        return ORJSONResponse(
             content={"message": "Internal Server Error - Something went wrong", "error_code": "INTERNAL_SERVER_ERROR"},
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
\ No newline at end of file
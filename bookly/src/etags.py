@@ -0,0 +1,48 @@
+from fastapi import Request, Response, status
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+def as_utc(value: datetime) -> datetime:
+    # timestamps are stored naive, in the server's local time (the columns default to datetime.now)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+def as_http_date(value: datetime) -> str:
+    return format_datetime(as_utc(value), usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> bool:
+    """
+    Evaluates If-None-Match (which wins when present) and If-Modified-Since against the
+    current validators of a resource
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return as_utc(last_modified) <= since
+
+def set_validators(response: Response, etag: str, last_modified: datetime | None = None) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    if last_modified is not None:
+        response.headers["Last-Modified"] = as_http_date(last_modified)
+
+def not_modified_response(etag: str, last_modified: datetime | None = None) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    return response
@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+from sqlalchemy import select
+import sqlmodel
+from datetime import datetime
+from src.errors import InvalidFields
+from src.etags import set_validators
+from src.responses import ORJSONResponse
+
+
+def parse_fields(fields: str | None, schema: type[BaseModel]) -> list[str] | None:
+    """
+    Splits a `fields=uid,title` query parameter into the requested fields of the response schema,
+    in order and without duplicates. None means the full representation was asked for.
+    """
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    allowed = {name for name, info in schema.model_fields.items() if not info.exclude}
+    if not requested or any(name not in allowed for name in requested):
+        raise InvalidFields()
+    return requested
+
+def select_columns(model, fields: list[str], *required: str) -> list:
+    """
+    Column attributes of `model` for the requested fields that are table columns, plus the
+    `required` ones the query itself needs (keyset keys, validators)
+    """
+    names = dict.fromkeys([*required, *fields])
+    return [getattr(model, name) for name in names if name in model.__table__.columns]
+
+def select_fields(model, fields: list[str] | None, *required: str):
+    """
+    select() of whole `model` entities, or of only the columns behind `fields` so sparse
+    responses skip ORM hydration and relationship loading
+    """
+    if not fields:
+        return sqlmodel.select(model)
+    # sqlalchemy's select: sqlmodel's would hand back bare scalars for a single column
+    return select(*select_columns(model, fields, *required))
+
+def project(row, fields: list[str]) -> dict:
+    mapping = row._mapping
+    return {name: mapping[name] for name in fields if name in mapping}
+
+def fields_response(content, etag: str | None = None, last_modified: datetime | None = None) -> ORJSONResponse:
+    # a sparse body doesn't fit the route's response_model, so it bypasses it
+    response = ORJSONResponse(content)
+    if etag is not None:
+        set_validators(response, etag, last_modified)
+    return response
@@ -1,5 +1,13 @@
 from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
+from aiosmtplib import SMTP, SMTPException, SMTPResponseException, SMTPRecipientsRefused, SMTPAuthenticationError
+from email.message import EmailMessage
+from email.utils import formataddr, formatdate, make_msgid
 from pathlib import Path
+import asyncio
+import itertools
+import logging
+import random
+import time
 from .config import Config
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -27,4 +35,144 @@ def create_message(recipients: list[str], subject: str, body: str) -> MessageSch
         body=body,
         subtype=MessageType.html,
     )
-    return message
\ No newline at end of file
+    return message
+
+class DomainRateLimiter:
+    """
+    Token bucket per recipient domain, shared by every batch sent from this worker process
+    """
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        # domain -> (tokens, last refill)
+        self.buckets: dict[str, tuple[float, float]] = {}
+
+    def reserve(self, domain: str) -> float:
+        """
+        Takes a token for `domain` and returns how many seconds to wait before using it
+        """
+        now = self.clock()
+        tokens, updated = self.buckets.get(domain, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate) - 1
+        self.buckets[domain] = (tokens, now)
+        return max(0.0, -tokens / self.rate)
+
+    async def acquire(self, domain: str) -> None:
+        delay = self.reserve(domain)
+        if delay:
+            await asyncio.sleep(delay)
+
+domain_limiter = DomainRateLimiter(Config.EMAIL_DOMAIN_RATE, Config.EMAIL_DOMAIN_BURST)
+
+def smtp_options() -> dict:
+    options = {
+        "hostname": Config.MAIL_SERVER,
+        "port": Config.MAIL_PORT,
+        "use_tls": Config.MAIL_SSL_TLS,
+        "start_tls": Config.MAIL_STARTTLS,
+        "validate_certs": Config.VALIDATE_CERTS
+    }
+    if Config.USE_CREDENTIALS:
+        options.update(username=Config.MAIL_USERNAME, password=Config.MAIL_PASSWORD)
+    return options
+
+def build_message(recipients: list[str], subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((Config.MAIL_FROM_NAME, Config.MAIL_FROM))
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    # required by RFC 5322; neither aiosmtplib nor most relays add them
+    message["Date"] = formatdate(localtime=True)
+    message["Message-ID"] = make_msgid(domain=Config.MAIL_FROM.rpartition("@")[2] or None)
+    message.set_content(body, subtype="html")
+    return message
+
+def recipient_domains(message: dict) -> set[str]:
+    return {recipient.rpartition("@")[2].lower() for recipient in message["recipients"]}
+
+def interleave_by_domain(messages: list[dict]) -> list[dict]:
+    """
+    Round-robins the messages over their first recipient's domain, so a burst to one
+    rate-limited domain doesn't hold every connection while other domains wait
+    """
+    by_domain: dict[str, list[dict]] = {}
+    for message in messages:
+        by_domain.setdefault(min(recipient_domains(message)), []).append(message)
+    return [message for group in itertools.zip_longest(*by_domain.values()) for message in group if message is not None]
+
+def is_permanent(error: Exception) -> bool:
+    # 5xx replies won't change on a retry; 4xx replies, timeouts and dropped connections might
+    if isinstance(error, SMTPRecipientsRefused):
+        return all(refused.code >= 500 for refused in error.recipients)
+    return isinstance(error, SMTPResponseException) and error.code >= 500 and not isinstance(error, SMTPAuthenticationError)
+
+def retry_delay(attempt: int) -> float:
+    return min(Config.EMAIL_RETRY_MAX_DELAY, Config.EMAIL_RETRY_DELAY * 2 ** attempt) * random.uniform(0.5, 1)
+
+async def send_batch(
+    messages: list[dict], options: dict | None = None, limiter: DomainRateLimiter = domain_limiter,
+    connections: int = Config.EMAIL_SMTP_CONNECTIONS, attempts: int = Config.EMAIL_MAX_ATTEMPTS
+) -> dict:
+    """
+    Sends {recipients, subject, body} messages over up to `connections` SMTP connections that
+    stay open for the whole batch, applying the per-domain rate limit. Transient failures are
+    retried with exponential backoff on a fresh connection, up to `attempts` times per message.
+    Returns the number sent, the messages the server rejected for good, the ones to retry later
+    and the recipients of otherwise delivered messages that were refused for good.
+    """
+    options = options or smtp_options()
+    pending = asyncio.Queue()
+    for message in interleave_by_domain(messages):
+        pending.put_nowait(message)
+    report = {"sent": 0, "rejected": [], "retry": [], "refused_recipients": []}
+
+    def record_refused(message: dict, refused: dict) -> None:
+        # the server took the message for some recipients only; retry the ones it deferred
+        logging.warning("Email partially refused: %s", {recipient: str(response) for recipient, response in refused.items()})
+        deferred = [recipient for recipient, response in refused.items() if response.code < 500]
+        report["refused_recipients"].extend(recipient for recipient, response in refused.items() if response.code >= 500)
+        if deferred:
+            report["retry"].append({**message, "recipients": deferred})
+
+    async def deliver(smtp: SMTP | None, message: dict) -> SMTP | None:
+        for domain in recipient_domains(message):
+            await limiter.acquire(domain)
+        for attempt in range(attempts):
+            try:
+                if smtp is None:
+                    smtp = SMTP(**options)
+                    await smtp.connect()
+                refused, _ = await smtp.send_message(build_message(message["recipients"], message["subject"], message["body"]))
+                report["sent"] += 1
+                if refused:
+                    record_refused(message, refused)
+                return smtp
+            except (SMTPException, OSError) as e:
+                if is_permanent(e):
+                    logging.warning("Email to %s rejected: %s", message["recipients"], e)
+                    report["rejected"].append(message)
+                    return smtp
+                # the connection may be unusable now, open a new one for the next try
+                if smtp is not None:
+                    smtp.close()
+                    smtp = None
+                if attempt + 1 < attempts:
+                    await asyncio.sleep(retry_delay(attempt))
+        report["retry"].append(message)
+        return smtp
+
+    async def worker():
+        smtp = None
+        try:
+            while not pending.empty():
+                smtp = await deliver(smtp, pending.get_nowait())
+        finally:
+            if smtp is not None and smtp.is_connected:
+                try:
+                    await smtp.quit()
+                except (SMTPException, OSError):
+                    smtp.close()
+
+    await asyncio.gather(*(worker() for _ in range(min(connections, len(messages)))))
+    return report
@@ -0,0 +1,105 @@
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+from celery.signals import before_task_publish, after_task_publish
+from sqlalchemy import event
+from src.db.instrumentation import record_statement
+import os
+import time
+
+# With several uvicorn workers, start them with PROMETHEUS_MULTIPROC_DIR pointing at an empty
+# directory: every process then writes its samples there and /metrics aggregates all of them.
+
+REQUEST_LATENCY = Histogram(
+    "bookly_http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"]
+)
+DB_STATEMENT_LATENCY = Histogram(
+    "bookly_db_statement_duration_seconds", "Time spent executing SQL statements",
+    ["database", "operation"]
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "bookly_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection"
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "bookly_db_pool_checked_out_connections", "Connections currently checked out of the pool",
+    ["database"], multiprocess_mode="livesum"
+)
+REDIS_COMMAND_LATENCY = Histogram(
+    "bookly_redis_command_duration_seconds", "Redis command latency",
+    ["command"]
+)
+CELERY_ENQUEUE_LATENCY = Histogram(
+    "bookly_celery_enqueue_duration_seconds", "Time spent publishing a task to the broker",
+    ["task"]
+)
+PRINCIPAL_CACHE_LOOKUPS = Counter(
+    "bookly_principal_cache_lookups", "Auth principal cache lookups by where they were answered",
+    ["result"]
+)
+PASSWORD_HASH_QUEUED = Gauge(
+    "bookly_password_hash_queued", "Password hash jobs waiting for a free hashing thread",
+    multiprocess_mode="livesum"
+)
+PASSWORD_HASH_MAX_QUEUED = Gauge(
+    "bookly_password_hash_max_queued", "Longest password hash queue seen since the process started",
+    multiprocess_mode="livemax"
+)
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "bookly_password_hash_in_flight", "Password hash jobs running on a hashing thread",
+    multiprocess_mode="livesum"
+)
+PASSWORD_HASH_COMPLETED = Counter(
+    "bookly_password_hash_completed", "Password hash jobs finished"
+)
+
+def observe_request(method: str, route: str | None, status: int, duration: float) -> None:
+    # unmatched paths share one label so scanners can't blow up the series count
+    REQUEST_LATENCY.labels(method, route or "unmatched", str(status)).observe(duration)
+
+def statement_operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+def instrument_engine(engine, database: str) -> None:
+    """
+    Times every statement run on `engine` (also into the current request's QueryStats) and
+    tracks how many of its connections are checked out
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def finish_statement(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._metrics_start
+        DB_STATEMENT_LATENCY.labels(database, statement_operation(statement)).observe(duration)
+        record_statement(statement, parameters, duration)
+
+    @event.listens_for(sync_engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.labels(database).inc()
+
+    @event.listens_for(sync_engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.labels(database).dec()
+
+publish_started: dict[str, float] = {}
+
+@before_task_publish.connect
+def start_publish(sender=None, headers=None, **kwargs):
+    if headers and "id" in headers:
+        publish_started[headers["id"]] = time.perf_counter()
+
+@after_task_publish.connect
+def finish_publish(sender=None, headers=None, **kwargs):
+    started = publish_started.pop((headers or {}).get("id"), None)
+    if started is not None:
+        CELERY_ENQUEUE_LATENCY.labels(sender or "unknown").observe(time.perf_counter() - started)
+
+def render_metrics() -> bytes:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
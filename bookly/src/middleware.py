@@ -3,21 +3,51 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.requests import Request
+from datetime import datetime, timezone
 import time
+import uuid
 import logging
+from src.access_log import access_log
+from src.metrics import observe_request
+from src.db.instrumentation import capture_queries, report_repeats
 
+# replaced by the structured access log below
 logger = logging.getLogger("uvicorn.access")
 logger.disabled = True
 
 def register_middleware(app: FastAPI):
     @app.middleware("http")
     async def custom_logging(request: Request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        message = f"{request.client.host}:{request.client.port} - {request.method} - {request.url.path} - {response.status_code} completed in {process_time} seconds"
-        print(message)
-        return response
+        request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+        request.state.request_id = request_id
+        start_time = time.perf_counter()
+        status_code = 500
+        with capture_queries() as queries:
+            try:
+                response = await call_next(request)
+                status_code = response.status_code
+                response.headers["X-Request-ID"] = request_id
+                # streamed bodies run their queries after this point and aren't counted
+                app_ms = (time.perf_counter() - start_time) * 1000
+                response.headers["Server-Timing"] = f"{queries.server_timing()}, app;dur={app_ms:.1f}"
+                return response
+            finally:
+                # the route template keeps ids out of the path, so lines group by endpoint
+                duration = time.perf_counter() - start_time
+                route = getattr(request.scope.get("route"), "path", None)
+                observe_request(request.method, route, status_code, duration)
+                access_log.log({
+                    "ts": datetime.now(timezone.utc).isoformat(),
+                    "request_id": request_id,
+                    "method": request.method,
+                    "route": route,
+                    "status": status_code,
+                    "duration_ms": round(duration * 1000, 3),
+                    "db_queries": queries.count,
+                    "db_ms": round(queries.duration * 1000, 3),
+                    **report_repeats(queries, route),
+                    "client": request.client.host if request.client else None
+                })
     
     # @app.middleware("http")
     # async def authorization(request: Request, call_next):
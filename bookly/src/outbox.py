@@ -0,0 +1,69 @@
+from typing import Callable
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.db.models import OutboxMessage
+
+# publish(task name, kwargs, task id)
+Publisher = Callable[[str, dict, str], None]
+
+# tasks are queued by name, so the web app never has to import the Celery module
+SEND_EMAIL = "src.celery_tasks.send_email"
+
+def enqueue_task(session: AsyncSession, task: str, **kwargs) -> OutboxMessage:
+    """
+    Queues a Celery task in the caller's transaction instead of publishing it: the relay sends it
+    once the transaction commits, and it is dropped with the transaction if that rolls back.
+    The request path never talks to the broker.
+    """
+    message = OutboxMessage(task=task, payload=kwargs)
+    session.add(message)
+    return message
+
+def plan_publishes(messages: list[OutboxMessage], batched: dict[str, str]) -> list[tuple[str, dict, list[int]]]:
+    """
+    Turns messages into (task, kwargs, outbox ids) publishes. Consecutive messages for a task in
+    `batched` become one call of its batch task, with their kwargs as `messages`.
+    """
+    publishes = []
+    for message in messages:
+        batch_task = batched.get(message.task)
+        if batch_task is None:
+            publishes.append((message.task, message.payload, [message.id]))
+        elif publishes and publishes[-1][0] == batch_task:
+            publishes[-1][1]["messages"].append(message.payload)
+            publishes[-1][2].append(message.id)
+        else:
+            publishes.append((batch_task, {"messages": [message.payload]}, [message.id]))
+    return publishes
+
+async def relay_batch(session: AsyncSession, publish: Publisher, limit: int, batched: dict[str, str] | None = None) -> int:
+    """
+    Publishes up to `limit` of the oldest messages and deletes them, oldest first. Rows are
+    locked with SKIP LOCKED, so concurrent relays never pick the same message. If publishing
+    fails, the messages sent so far are still deleted and the rest wait for the next run.
+    Delivery is at least once; the (first) outbox id is passed on as the Celery task id.
+    """
+    statement = select(OutboxMessage).order_by(OutboxMessage.id).limit(limit).with_for_update(skip_locked=True)
+    messages = (await session.exec(statement)).all()
+    published = []
+    try:
+        for task, kwargs, ids in plan_publishes(messages, batched or {}):
+            publish(task, kwargs, f"outbox-{ids[0]}")
+            published.extend(ids)
+    finally:
+        if published:
+            await session.exec(delete(OutboxMessage).where(OutboxMessage.id.in_(published)))
+        await session.commit()
+    return len(published)
+
+async def drain_outbox(
+    session_maker: async_sessionmaker, publish: Publisher, batch_size: int, batched: dict[str, str] | None = None
+) -> int:
+    relayed = 0
+    async with session_maker() as session:
+        while True:
+            count = await relay_batch(session, publish, batch_size, batched)
+            relayed += count
+            if count < batch_size:
+                return relayed
@@ -0,0 +1,41 @@
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from datetime import datetime
+import orjson
+import uuid
+from src.etags import set_validators
+
+
+def encode_default(value):
+    # ORM rows and models nested in plain dicts; UUIDs, datetimes and dates are native to orjson
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    # asyncpg hands back its own UUID subclass, which orjson only encodes as exactly uuid.UUID
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class ORJSONResponse(JSONResponse):
+    """
+    The app's default response class: FastAPI still validates route results against their
+    response_model, but the JSON is written by orjson instead of json.dumps
+    """
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+class ModelResponse(JSONResponse):
+    """
+    Renders an already validated model with pydantic-core's own JSON encoder, skipping
+    FastAPI's response_model validation and the intermediate dict
+    """
+    def render(self, content: BaseModel) -> bytes:
+        return content.__pydantic_serializer__.to_json(content)
+
+def model_response(schema: type[BaseModel], content, etag: str | None = None, last_modified: datetime | None = None) -> ModelResponse:
+    """
+    Validates `content` (ORM objects, rows or dicts) into `schema` once and renders it directly
+    """
+    response = ModelResponse(schema.model_validate(content, from_attributes=True))
+    if etag is not None:
+        set_validators(response, etag, last_modified)
+    return response
@@ -1,18 +1,23 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, status, Request, Response
 from fastapi.exceptions import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.models import User
-from src.db.main import get_session
-from src.auth.dependencies import get_current_user
+from src.auth.schemas import Principal
+from src.db.main import get_session, get_read_session
+from src.auth.dependencies import get_current_user, access_token_bearer, RoleChecker
+from src.db.export import ExportFormat, export_response, as_local_time
+from typing import Optional
+from datetime import datetime
 from .schemas import CreateReview, Review
 from .service import ReviewService
 from src.errors import ReviewNotFound, InsufficientPermission
+from src.etags import make_etag, is_not_modified, set_validators, not_modified_response
+from src.fields import parse_fields, project, fields_response
 
 review_router = APIRouter()
 review_service = ReviewService()
 
 @review_router.post("/book/{book_id}", status_code= status.HTTP_201_CREATED, response_model=Review)
-async def add_review_to_book(book_id: str, review_data: CreateReview, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
+async def add_review_to_book(book_id: str, review_data: CreateReview, current_user: Principal = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     new_review = await review_service.add_review_to_book(
         user_email= current_user.email,
         book_uid= book_id,
@@ -21,19 +26,36 @@ async def add_review_to_book(book_id: str, review_data: CreateReview, current_us
     )
     return new_review
 
+@review_router.get("/export", dependencies=[Depends(RoleChecker(["admin"]))])
+async def export_reviews(format: ExportFormat = "ndjson", since: Optional[datetime] = None, token_details: dict = Depends(access_token_bearer)):
+    return await export_response(review_service.export_statement(as_local_time(since)), format, "reviews")
+
 @review_router.get("/{review_id}", response_model=Review)
-async def get_a_review_by_id(review_id: str, session: AsyncSession = Depends(get_session)):
-    review = await review_service.get_review_by_id(review_id, session)
+async def get_a_review_by_id(review_id: str, request: Request, response: Response, fields: Optional[str] = None, session: AsyncSession = Depends(get_read_session)):
+    requested = parse_fields(fields, Review)
+    updated_at = await review_service.get_review_version(review_id, session)
+    if updated_at is None:
+        raise ReviewNotFound()
+
+    etag = make_etag(review_id, fields, updated_at)
+    if is_not_modified(request, etag, updated_at):
+        return not_modified_response(etag, updated_at)
+
+    review = await review_service.get_review_by_id(review_id, session, requested)
+    if review is not None and requested:
+        return fields_response(project(review, requested), etag, updated_at)
     if review is not None:
+        set_validators(response, etag, updated_at)
         return review
     raise ReviewNotFound()
 
 @review_router.delete("/{review_id}", status_code= status.HTTP_204_NO_CONTENT)
-async def delete_a_review_by_id(review_id: str, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
+async def delete_a_review_by_id(review_id: str, session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_user)):
     review = await review_service.get_review_by_id(review_id, session)
+    if review is None:
+        raise ReviewNotFound()
     if current_user.uid != review.user_uid:
         raise InsufficientPermission()
-    if review is not None:
-        await review_service.delete_review_by_id(review_id, session)
-        return {}
-    raise ReviewNotFound()
\ No newline at end of file
+    # already loaded for the ownership check, so it isn't fetched a second time
+    await review_service.delete_review(review, session)
+    return {}
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 import uuid
 
 class Review(BaseModel):
@@ -12,6 +12,12 @@ class Review(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+ReviewSort = Literal["newest", "highest_rating"]
+
+class ReviewPage(BaseModel):
+    reviews: List[Review]
+    next_cursor: Optional[str] = None
+
 class CreateReview(BaseModel):
-    rating: int = Field(lt=5)
+    rating: int = Field(ge=0, lt=5)
     review_text: str
\ No newline at end of file
@@ -1,56 +1,133 @@
 from fastapi import status
 from fastapi.exceptions import HTTPException
-from sqlmodel import select
+from sqlmodel import select, update, case, cast, Float, desc, tuple_
 from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import datetime
 import logging
-from src.db.models import Review
+import uuid
+from src.db.models import Review, Book
+from src.db.pagination import decode_cursor, paginate
+from src.errors import InvalidCursor
+from src.fields import select_fields
 from src.auth.service import UserService
 from src.books.service import BookService
-from .schemas import CreateReview
+from .schemas import CreateReview, ReviewSort
 
 user_service = UserService()
 book_service = BookService()
 
+def rating_update(book_uid, rating: int, delta: int):
+    """
+    UPDATE that adds (delta=1) or removes (delta=-1) one rating from a book's aggregates.
+    The right-hand sides see the row before the update, so concurrent reviews can't lose counts.
+    """
+    review_count = Book.review_count + delta
+    rating_sum = Book.rating_sum + delta * rating
+    return (
+        update(Book)
+        .where(Book.uid == book_uid)
+        .values({
+            Book.review_count: review_count,
+            Book.rating_sum: rating_sum,
+            Book.rating_histogram[rating]: Book.rating_histogram[rating] + delta,
+            Book.rating_avg: case((review_count > 0, cast(rating_sum, Float) / review_count), else_=None)
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+# keyset columns for each sort order of a book's reviews, all descending
+REVIEW_SORT_KEYS = {
+    "newest": (Review.created_at, Review.uid),
+    "highest_rating": (Review.rating, Review.created_at, Review.uid),
+}
+
+def review_cursor(sort: ReviewSort):
+    def cursor_for(review: Review) -> dict:
+        return {
+            "sort": sort,
+            **{column.key: str(getattr(review, column.key)) for column in REVIEW_SORT_KEYS[sort]}
+        }
+    return cursor_for
+
+def parse_review_cursor(cursor: str, sort: ReviewSort) -> tuple:
+    payload = decode_cursor(cursor)
+    parsers = {"created_at": datetime.fromisoformat, "uid": uuid.UUID, "rating": int}
+    if payload.get("sort") != sort:
+        raise InvalidCursor()
+    try:
+        return tuple(parsers[column.key](payload[column.key]) for column in REVIEW_SORT_KEYS[sort])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidCursor() from e
+
 class ReviewService:
     async def add_review_to_book(self, user_email: str, book_uid: str, review_data: CreateReview, session: AsyncSession):
         try:
             book = await book_service.get_book(book_uid, session)
             if book is None:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
-            user = await user_service.get_user_by_email(user_email, session)
+            user = await user_service.get_principal_by_email(user_email, session)
             if user is None:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
             
             review_data_dict = review_data.model_dump()
             new_review = Review(**review_data_dict)
-            new_review.user = user
-            new_review.book = book
+            new_review.user_uid = user.uid
+            new_review.book_uid = book.uid
             
             session.add(new_review)
+            await session.exec(rating_update(book.uid, new_review.rating, 1))
             await session.commit()
             return new_review
         except Exception as e:
             logging.exception(e)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
-    async def get_review_by_id(self, review_id: str, session: AsyncSession):
+    async def get_review_by_id(self, review_id: str, session: AsyncSession, fields: list[str] | None = None):
         try:
-            statement = select(Review).where(Review.uid == review_id)
+            statement = select_fields(Review, fields, "uid").where(Review.uid == review_id)
             result = await session.exec(statement)
             return result.first()
         except Exception as e:
             logging.exception(e)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
-    async def delete_review_by_id(self, review_id: str, session: AsyncSession):
+    async def get_book_reviews(self, book_uid: str, session: AsyncSession, limit: int, sort: ReviewSort = "newest", cursor: str | None = None, fields: list[str] | None = None):
+        keys = REVIEW_SORT_KEYS[sort]
+        statement = (
+            select_fields(Review, fields, *(column.key for column in keys), "updated_at")
+            .where(Review.book_uid == book_uid)
+            .order_by(*(desc(column) for column in keys))
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            statement = statement.where(tuple_(*keys) < tuple_(*parse_review_cursor(cursor, sort)))
+        result = await session.exec(statement)
+        return paginate(result.all(), limit, review_cursor(sort))
+
+    def export_statement(self, since: datetime | None = None):
+        statement = select(*Review.__table__.columns)
+        if since is not None:
+            statement = statement.where(Review.updated_at >= since)
+        return statement
+
+    async def get_review_version(self, review_id: str, session: AsyncSession):
+        statement = select(Review.updated_at).where(Review.uid == review_id)
+        result = await session.exec(statement)
+        return result.first()
+
+    async def delete_review(self, review: Review, session: AsyncSession):
         try:
-            review_to_delete = await self.get_review_by_id(review_id, session)
-            if review_to_delete is not None:
-                await session.delete(review_to_delete)
-                await session.commit()
-                return {}
-            else:
-                return None
+            await session.delete(review)
+            if review.book_uid is not None:
+                await session.exec(rating_update(review.book_uid, review.rating, -1))
+            await session.commit()
+            return {}
         except Exception as e:
             logging.exception(e)
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
\ No newline at end of file
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    async def delete_review_by_id(self, review_id: str, session: AsyncSession):
+        review_to_delete = await self.get_review_by_id(review_id, session)
+        if review_to_delete is None:
+            return None
+        return await self.delete_review(review_to_delete, session)
\ No newline at end of file
@@ -0,0 +1,48 @@
+import io
+import json
+import logging
+import queue
+from src.access_log import AccessLog, DroppingQueueHandler, access_logger
+
+
+def access_record(entry):
+    record = logging.LogRecord("bookly.access", logging.INFO, __file__, 0, "access", None, None)
+    record.access = entry
+    return record
+
+def test_full_queue_drops_and_counts_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+
+    for i in range(5):
+        handler.handle(access_record({"status": 200, "i": i}))
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+def test_access_log_writes_json_lines_from_background_thread():
+    stream = io.StringIO()
+    log = AccessLog(max_queue=100, sample_rate=1.0, stream=stream)
+
+    log.start()
+    try:
+        log.log({"request_id": "abc", "route": "/api/v1/books/{book_id}", "status": 200, "duration_ms": 1.5})
+    finally:
+        log.stop()
+
+    line = json.loads(stream.getvalue())
+    assert line == {"request_id": "abc", "route": "/api/v1/books/{book_id}", "status": 200, "duration_ms": 1.5, "dropped": 0}
+    assert log.handler not in access_logger.handlers
+
+def test_sampling_skips_successes_but_keeps_errors():
+    stream = io.StringIO()
+    log = AccessLog(max_queue=100, sample_rate=0.0, stream=stream)
+
+    log.start()
+    try:
+        log.log({"status": 200})
+        log.log({"status": 404})
+        log.log({"status": 503})
+    finally:
+        log.stop()
+
+    assert [json.loads(line)["status"] for line in stream.getvalue().splitlines()] == [404, 503]
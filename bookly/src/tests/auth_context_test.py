@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from src.auth import dependencies
+from src.auth.dependencies import get_auth_context
+from src.auth.schemas import Principal
+from src.errors import InvalidToken, RevokedToken
+
+
+def fake_request():
+    return SimpleNamespace(state=SimpleNamespace())
+
+def use_principal(monkeypatch, token_version=0):
+    calls = {"principal": 0}
+
+    async def fake_get_principal(token_user, session):
+        calls["principal"] += 1
+        return Principal(uid="5f0c2c5e-6a9f-4a43-9a51-3f1ab0c1c0de", email="a@b.c", role="user", is_verified=True, token_version=token_version)
+
+    monkeypatch.setattr(dependencies, "get_principal", fake_get_principal)
+    return calls
+
+def test_token_is_verified_once_per_request(monkeypatch):
+    calls = {"decode": 0, "blocklist": 0}
+
+    def fake_verify(token):
+        calls["decode"] += 1
+        return {"jti": "abc", "refresh": False, "user": {"email": "a@b.c"}}
+
+    async def fake_blocklist(jti):
+        calls["blocklist"] += 1
+        return False
+
+    monkeypatch.setattr(dependencies, "verify_access_token", fake_verify)
+    monkeypatch.setattr(dependencies, "token_in_blocklist", fake_blocklist)
+    principal_calls = use_principal(monkeypatch)
+
+    request = fake_request()
+
+    async def resolve_twice():
+        first = await get_auth_context(request, "token", None)
+        second = await get_auth_context(request, "token", None)
+        return first, second
+
+    first, second = asyncio.run(resolve_twice())
+
+    assert first is second
+    assert calls == {"decode": 1, "blocklist": 1}
+    assert principal_calls == {"principal": 1}
+
+def test_revoked_token_is_rejected(monkeypatch):
+    async def fake_blocklist(jti):
+        return True
+
+    monkeypatch.setattr(dependencies, "verify_access_token", lambda token: {"jti": "abc"})
+    monkeypatch.setattr(dependencies, "token_in_blocklist", fake_blocklist)
+
+    with pytest.raises(InvalidToken):
+        asyncio.run(get_auth_context(fake_request(), "token", None))
+
+def test_token_from_older_generation_is_rejected(monkeypatch):
+    async def fake_blocklist(jti):
+        return False
+
+    monkeypatch.setattr(dependencies, "verify_access_token", lambda token: {"jti": "abc", "ver": 0, "user": {"email": "a@b.c"}})
+    monkeypatch.setattr(dependencies, "token_in_blocklist", fake_blocklist)
+    use_principal(monkeypatch, token_version=1)
+
+    with pytest.raises(RevokedToken):
+        asyncio.run(get_auth_context(fake_request(), "token", None))
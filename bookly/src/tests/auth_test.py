@@ -1,4 +1,10 @@
-from src.auth.schemas import CreateUser
+import uuid
+from fastapi.testclient import TestClient
+from src import app
+from src.auth import service
+from src.auth.dependencies import get_current_user
+from src.auth.schemas import CreateUser, Principal
+from src.db.main import get_session
 
 auth_prefix = f"/api/v1/auth"
 
@@ -22,3 +28,39 @@ def test_user_creation(fake_session, fake_user_service, test_client):
 
     assert fake_user_service.create_user_called_once()
     assert fake_user_service.create_user_called_once_with(user_data, fake_session)
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    async def exec(self, statement):
+        self.statements.append(statement)
+
+    async def commit(self):
+        self.commits += 1
+
+def test_logout_all_bumps_the_token_version_of_unverified_users(monkeypatch):
+    principal = Principal(uid=uuid.uuid4(), email="new@example.com", role="user", is_verified=False)
+    session = RecordingSession()
+    invalidated = []
+
+    async def fake_invalidate(uid):
+        invalidated.append(uid)
+
+    def get_recording_session():
+        yield session
+    monkeypatch.setattr(service.principal_cache, "invalidate", fake_invalidate)
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: principal)
+    monkeypatch.setitem(app.dependency_overrides, get_session, get_recording_session)
+
+    # ?fields belongs to /me and is ignored here
+    response = TestClient(app, base_url="http://localhost").get(f"{auth_prefix}/logout_all", params={"fields": "uid"})
+
+    assert response.status_code == 200
+    (statement,) = session.statements
+    compiled = statement.compile()
+    assert "token_version=(users.token_version + :token_version_1) WHERE users.uid = :uid_1" in str(compiled)
+    assert compiled.params["token_version_1"] == 1 and compiled.params["uid_1"] == principal.uid
+    assert session.commits == 1
+    assert invalidated == [str(principal.uid)]
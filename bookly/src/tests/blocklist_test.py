@@ -0,0 +1,83 @@
+import asyncio
+import time
+from fakeredis import FakeAsyncRedis
+from src.db import redis
+from src.db.redis import LocalBlocklist
+
+
+class FakeRedis:
+    def __init__(self, index):
+        self.index = index
+        self.gets = 0
+
+    async def zremrangebyscore(self, name, low, high):
+        self.index = {jti: score for jti, score in self.index.items() if score > high}
+
+    async def zrangebyscore(self, name, low, high, withscores=False):
+        return [(jti.encode(), score) for jti, score in self.index.items() if score >= low]
+
+    async def get(self, name):
+        self.gets += 1
+        return b"" if name in self.index else None
+
+    async def exists(self, name):
+        # the index has already been backfilled
+        return 1
+
+def test_bootstrap_loads_only_live_entries():
+    now = time.time()
+    blocklist = LocalBlocklist(FakeRedis({"live": now + 60, "expired": now - 60}), "channel", "index")
+
+    asyncio.run(blocklist.bootstrap())
+
+    assert blocklist.contains("live")
+    assert not blocklist.contains("expired")
+    assert not blocklist.contains("unknown")
+
+def test_entries_expire_locally():
+    blocklist = LocalBlocklist(FakeRedis({}), "channel", "index")
+    blocklist.add("soon", time.time() - 1)
+    blocklist.add("later", time.time() + 60)
+
+    blocklist.purge()
+
+    assert list(blocklist.entries) == ["later"]
+
+def test_lookup_falls_back_to_redis_until_synced(monkeypatch):
+    fake = FakeRedis({"revoked": time.time() + 60})
+    mirror = LocalBlocklist(fake, "channel", "index")
+    monkeypatch.setattr(redis, "token_blocklist", fake)
+    monkeypatch.setattr(redis, "local_blocklist", mirror)
+
+    assert asyncio.run(redis.token_in_blocklist("revoked"))
+    assert fake.gets == 1
+
+    asyncio.run(mirror.bootstrap())
+    mirror.synced = True
+
+    assert asyncio.run(redis.token_in_blocklist("revoked"))
+    assert not asyncio.run(redis.token_in_blocklist("other"))
+    assert fake.gets == 1
+
+async def bootstrap_twice(client):
+    # revoked before the index existed
+    await client.set("0b7d5c1e-6f4a-4f7e-9a55-2d4c1c0f3e11", "", ex=600)
+    await client.set("recent_write:0b7d5c1e-6f4a-4f7e-9a55-2d4c1c0f3e11", "", ex=600)
+    first = LocalBlocklist(client, "channel", "index")
+    await first.bootstrap()
+
+    # revoked by a worker that doesn't write the index, after the backfill has run
+    await client.set("5f0e7c9a-1b2d-4c3e-8f4a-6b7c8d9e0f12", "", ex=600)
+    second = LocalBlocklist(client, "channel", "index")
+    await second.bootstrap()
+    return first, second, await client.zrange("index", 0, -1)
+
+def test_bootstrap_backfills_the_index_from_existing_jti_keys():
+    first, second, index = asyncio.run(bootstrap_twice(FakeAsyncRedis()))
+
+    assert first.contains("0b7d5c1e-6f4a-4f7e-9a55-2d4c1c0f3e11")
+    assert 590 < first.entries["0b7d5c1e-6f4a-4f7e-9a55-2d4c1c0f3e11"] - time.time() <= 600
+    assert index == [b"0b7d5c1e-6f4a-4f7e-9a55-2d4c1c0f3e11"]
+    # the scan only runs until it has completed once
+    assert second.contains("0b7d5c1e-6f4a-4f7e-9a55-2d4c1c0f3e11")
+    assert not second.contains("5f0e7c9a-1b2d-4c3e-8f4a-6b7c8d9e0f12")
@@ -0,0 +1,32 @@
+import uuid
+from datetime import datetime
+import pytest
+from src.db.models import Review
+from src.db.pagination import encode_cursor
+from src.errors import InvalidCursor
+from src.reviews.service import review_cursor, parse_review_cursor
+
+
+def make_review(rating):
+    return Review(uid=uuid.uuid4(), rating=rating, review_text="ok", created_at=datetime(2024, 5, 1, 12, 30))
+
+@pytest.mark.parametrize("sort", ["newest", "highest_rating"])
+def test_review_cursor_round_trips(sort):
+    review = make_review(3)
+
+    cursor = encode_cursor(review_cursor(sort)(review))
+
+    expected = (review.created_at, review.uid) if sort == "newest" else (3, review.created_at, review.uid)
+    assert parse_review_cursor(cursor, sort) == expected
+
+def test_review_cursor_is_tied_to_its_sort():
+    cursor = encode_cursor(review_cursor("newest")(make_review(1)))
+
+    with pytest.raises(InvalidCursor):
+        parse_review_cursor(cursor, "highest_rating")
+
+def test_review_cursor_rejects_bad_values():
+    cursor = encode_cursor({"sort": "newest", "created_at": "yesterday", "uid": "x"})
+
+    with pytest.raises(InvalidCursor):
+        parse_review_cursor(cursor, "newest")
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, date
+import uuid
+import pytest
+from src.books.bulk import iter_lines, iter_records, build_book_row
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+def collect(chunks, content_type):
+    async def run():
+        return [row async for row in iter_records(iter_lines(stream(*chunks)), content_type)]
+    return asyncio.run(run())
+
+book = '{"title": "The Hobbit", "author": "J.R.R. Tolkien", "publisher": "Allen & Unwin", "published_date": "1937-09-21", "page_count": 310, "language": "English"}'
+
+def test_ndjson_lines_split_across_chunks():
+    body = f"{book}\n\nnot json\n{book}".encode()
+    rows = collect([body[:25], body[25:90], body[90:]], "application/x-ndjson")
+
+    assert [(line, error is None) for line, _, error in rows] == [(1, True), (3, False), (4, True)]
+    assert rows[0][1]["title"] == "The Hobbit"
+
+def test_rows_that_are_not_utf8_are_reported_and_skipped():
+    body = book.encode() + b"\n" + book.replace("Hobbit", "Hobbit \xe9").encode("latin-1") + b"\n" + book.encode()
+    rows = collect([body[:200], body[200:]], "application/x-ndjson")
+
+    assert [(line, error is None) for line, _, error in rows] == [(1, True), (2, False), (3, True)]
+    assert rows[1][2].startswith("invalid UTF-8")
+
+def test_csv_uses_header_row():
+    body = b"title,author,publisher,published_date,page_count,language\r\nThe Hobbit,Tolkien,\"Allen, Unwin\",1937-09-21,310,English\r\ntoo,few\r\n"
+    rows = collect([body], "text/csv; charset=utf-8")
+
+    assert rows[0][0] == 2
+    assert rows[0][1]["publisher"] == "Allen, Unwin"
+    assert rows[1][2] == "expected 6 columns, got 2"
+
+def test_build_book_row_validates_and_parses_dates():
+    now = datetime.now()
+    user_uid = uuid.uuid4()
+    _, record, _ = collect([book.encode()], "application/x-ndjson")[0]
+
+    row = build_book_row(record, user_uid, now)
+    assert row["published_date"] == date(1937, 9, 21)
+    assert row["user_uid"] == user_uid
+
+    with pytest.raises(ValueError):
+        build_book_row({**record, "published_date": "21/09/1937"}, user_uid, now)
+    with pytest.raises(ValueError):
+        build_book_row({**record, "page_count": "many"}, user_uid, now)
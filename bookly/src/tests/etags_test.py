@@ -0,0 +1,87 @@
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from src.books import routes
+from src.books.routes import page_etag
+from src.etags import make_etag, is_not_modified, as_http_date
+
+
+def request_with(headers):
+    return SimpleNamespace(headers=headers)
+
+updated_at = datetime(2025, 8, 14, 2, 40, 21, 586941)
+
+def test_etag_changes_with_any_part():
+    assert make_etag("book", updated_at, 3) == make_etag("book", updated_at, 3)
+    assert make_etag("book", updated_at, 3) != make_etag("book", updated_at, 4)
+
+def test_if_none_match():
+    etag = make_etag("book", updated_at)
+
+    assert is_not_modified(request_with({"if-none-match": etag}), etag)
+    assert is_not_modified(request_with({"if-none-match": f'"other", W/{etag}'}), etag)
+    assert not is_not_modified(request_with({"if-none-match": '"other"'}), etag)
+    assert not is_not_modified(request_with({}), etag)
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    etag = make_etag("book", updated_at)
+    headers = {"if-none-match": '"other"', "if-modified-since": as_http_date(updated_at)}
+
+    assert not is_not_modified(request_with(headers), etag, updated_at)
+
+def test_if_modified_since():
+    etag = make_etag("book", updated_at)
+
+    assert is_not_modified(request_with({"if-modified-since": as_http_date(updated_at)}), etag, updated_at)
+    assert not is_not_modified(request_with({"if-modified-since": "Mon, 11 Aug 2025 00:00:00 GMT"}), etag, updated_at)
+    assert not is_not_modified(request_with({"if-modified-since": "garbage"}), etag, updated_at)
+
+def test_http_dates_convert_local_timestamps_to_utc(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    try:
+        assert as_http_date(datetime(2025, 8, 14, 8, 10, 21)) == "Thu, 14 Aug 2025 02:40:21 GMT"
+        assert is_not_modified(request_with({"if-modified-since": "Thu, 14 Aug 2025 02:40:21 GMT"}), '"x"', datetime(2025, 8, 14, 8, 10, 21))
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+def test_page_etag_changes_when_a_row_leaves_the_page():
+    books = [SimpleNamespace(uid=uid, updated_at=updated_at) for uid in ("a", "b", "c")]
+
+    # deleting "b" leaves the newest updated_at unchanged, but not the ETag
+    assert page_etag(books, 20, None) != page_etag([books[0], books[2]], 20, None)
+
+class FakePageService:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def search_books(self, *args):
+        return self.rows, None
+
+    async def get_top_rated_books(self, *args):
+        return self.rows, None
+
+    async def get_book_reviews(self, *args):
+        return self.rows, None
+
+page_routes = [
+    lambda request: routes.search_books(request, q="dune", limit=20, cursor=None, fields="title", token_details={}, session=None),
+    lambda request: routes.get_top_rated_books(request, min_reviews=1, limit=20, cursor=None, fields="title", token_details={}, session=None),
+    lambda request: routes.get_book_reviews("book", request, sort="newest", limit=20, cursor=None, fields="review_text", token_details={}, session=None),
+]
+
+@pytest.mark.parametrize("route", page_routes)
+def test_paginated_routes_revalidate_with_page_etag(route, monkeypatch):
+    row = SimpleNamespace(uid="a", updated_at=updated_at, _mapping={"uid": "a", "title": "Dune", "review_text": "Great"})
+    monkeypatch.setattr(routes, "book_service", FakePageService([row]))
+    monkeypatch.setattr(routes, "review_service", FakePageService([row]))
+
+    response = asyncio.run(route(request_with({})))
+    etag = response.headers["ETag"]
+    revalidated = asyncio.run(route(request_with({"if-none-match": etag})))
+
+    assert response.status_code == 200
+    assert revalidated.status_code == 304 and revalidated.headers["ETag"] == etag
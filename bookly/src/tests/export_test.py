@@ -0,0 +1,86 @@
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, date, timezone
+import pytest
+from src.db import export
+from src.db.export import encode_rows, export_response, as_local_time
+
+
+uid = uuid.uuid4()
+rows = [(uid, "The Hobbit", date(1937, 9, 21), datetime(2025, 8, 14, 2, 40))]
+columns = ["uid", "title", "published_date", "created_at"]
+
+def test_ndjson_encodes_one_object_per_line():
+    lines = encode_rows(rows * 2, columns, "ndjson").decode().splitlines()
+
+    assert len(lines) == 2
+    assert json.loads(lines[0]) == {"uid": str(uid), "title": "The Hobbit", "published_date": "1937-09-21", "created_at": "2025-08-14T02:40:00"}
+
+def test_csv_encodes_values_in_column_order():
+    assert encode_rows(rows, columns, "csv").decode() == f"{uid},The Hobbit,1937-09-21,2025-08-14T02:40:00\r\n"
+
+def test_csv_encodes_lists_as_json():
+    assert encode_rows([(uid, [0, 1, 0, 2, 5])], ["uid", "rating_histogram"], "csv").decode() == f'{uid},"[0, 1, 0, 2, 5]"\r\n'
+
+def test_since_is_converted_to_naive_local_time(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    try:
+        assert as_local_time(datetime(2025, 8, 14, 2, 40, tzinfo=timezone.utc)) == datetime(2025, 8, 14, 8, 10)
+        assert as_local_time(datetime(2025, 8, 14, 2, 40)) == datetime(2025, 8, 14, 2, 40)
+        assert as_local_time(None) is None
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+class FakeStream:
+    def keys(self):
+        return columns
+
+    async def partitions(self):
+        yield rows
+
+class FakeSession:
+    def __init__(self, error=None):
+        self.error = error
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    async def stream(self, statement):
+        if self.error is not None:
+            raise self.error
+        return FakeStream()
+
+class FakeStatement:
+    def execution_options(self, **options):
+        return self
+
+async def read_body(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+def test_export_query_errors_are_raised_before_the_response_starts(monkeypatch):
+    session = FakeSession(ValueError("can't subtract offset-naive and offset-aware datetimes"))
+    monkeypatch.setattr(export, "read_session_maker", lambda: lambda: session)
+
+    with pytest.raises(ValueError):
+        asyncio.run(export_response(FakeStatement(), "csv", "books"))
+
+    assert session.closed
+
+def test_export_response_streams_the_header_and_rows(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(export, "read_session_maker", lambda: lambda: session)
+
+    async def run():
+        return await read_body(await export_response(FakeStatement(), "csv", "books"))
+    body = asyncio.run(run())
+
+    assert body.decode() == f"uid,title,published_date,created_at\r\n{uid},The Hobbit,1937-09-21,2025-08-14T02:40:00\r\n"
+    assert session.closed
@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+from src.auth.schemas import UserBooks
+from src.books.schemas import Books, BookDetail
+from src.db.models import Book
+from src.errors import InvalidFields
+from src.fields import parse_fields, select_fields
+
+
+def test_parse_fields_keeps_order_and_drops_duplicates():
+    assert parse_fields(" title,uid,title ", Books) == ["title", "uid"]
+    assert parse_fields(None, Books) is None
+
+def test_parse_fields_accepts_relations_of_the_schema():
+    assert parse_fields("title,reviews", BookDetail) == ["title", "reviews"]
+
+@pytest.mark.parametrize("fields", ["", ",", "title,user_uid", "reviews"])
+def test_parse_fields_rejects_unknown_fields(fields):
+    with pytest.raises(InvalidFields):
+        parse_fields(fields, Books)
+
+def test_parse_fields_never_exposes_excluded_fields():
+    with pytest.raises(InvalidFields):
+        parse_fields("email,password", UserBooks)
+
+def test_select_fields_selects_only_requested_and_required_columns():
+    statement = select_fields(Book, ["title", "reviews"], "uid")
+
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("SELECT books.uid, books.title \nFROM books")
+
+def test_select_fields_selects_entities_without_fields():
+    statement = select_fields(Book, None)
+
+    assert "books.search_vector" not in str(statement.compile(dialect=postgresql.dialect()))
+    assert statement.column_descriptions[0]["entity"] is Book
@@ -0,0 +1,25 @@
+import asyncio
+import src
+from src import app
+
+
+def test_lifespan_starts_the_blocklist_and_disposes_the_engines(monkeypatch):
+    calls = []
+
+    async def fake_close_db():
+        calls.append("close_db")
+
+    async def fake_stop():
+        calls.append("blocklist.stop")
+    monkeypatch.setattr(src, "close_db", fake_close_db)
+    monkeypatch.setattr(src.local_blocklist, "start", lambda: calls.append("blocklist.start"))
+    monkeypatch.setattr(src.local_blocklist, "stop", fake_stop)
+    monkeypatch.setattr(src.access_log, "start", lambda: calls.append("access_log.start"))
+    monkeypatch.setattr(src.access_log, "stop", lambda: calls.append("access_log.stop"))
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            calls.append("serving")
+    asyncio.run(run())
+
+    assert calls == ["access_log.start", "blocklist.start", "serving", "blocklist.stop", "close_db", "access_log.stop"]
@@ -0,0 +1,128 @@
+import asyncio
+import socket
+from email import message_from_bytes
+import pytest
+from aiosmtpd.controller import Controller
+from src import celery_tasks, mail
+from src.mail import DomainRateLimiter, interleave_by_domain, send_batch
+
+
+class RecordingHandler:
+    """
+    Accepts everything except bounce@ addresses (550) and the first delivery to flaky@ (451)
+    """
+    def __init__(self):
+        self.delivered = []
+        self.contents = []
+        self.sessions = set()
+        self.flaky_refused = False
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce@"):
+            return "550 no such user"
+        if address.startswith("flaky@") and not self.flaky_refused:
+            self.flaky_refused = True
+            return "451 try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.delivered.extend(envelope.rcpt_tos)
+        self.contents.append(message_from_bytes(envelope.original_content))
+        return "250 Message accepted"
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield handler, {"hostname": "127.0.0.1", "port": port, "use_tls": False, "start_tls": False}
+    controller.stop()
+
+def message(recipient):
+    return {"recipients": [recipient], "subject": "Verify Your Email - Bookly", "body": "<p>hi</p>"}
+
+def test_batch_reuses_a_few_connections(smtp_server):
+    handler, options = smtp_server
+    messages = [message(f"user{i}@example{i % 3}.com") for i in range(30)]
+
+    report = asyncio.run(send_batch(messages, options, DomainRateLimiter(1000, 1000), connections=2))
+
+    assert report == {"sent": 30, "rejected": [], "retry": [], "refused_recipients": []}
+    assert sorted(handler.delivered) == sorted(m["recipients"][0] for m in messages)
+    assert len(handler.sessions) == 2
+    assert all(content["Date"] and content["Message-ID"] for content in handler.contents)
+    assert len({content["Message-ID"] for content in handler.contents}) == 30
+
+def test_batch_retries_transient_failures_and_drops_permanent_ones(smtp_server, monkeypatch):
+    handler, options = smtp_server
+    monkeypatch.setattr(mail, "retry_delay", lambda attempt: 0)
+    messages = [message("flaky@example.com"), message("bounce@example.com"), message("ok@example.com")]
+
+    report = asyncio.run(send_batch(messages, options, DomainRateLimiter(1000, 1000), connections=1, attempts=2))
+
+    assert report["sent"] == 2
+    assert report["rejected"] == [message("bounce@example.com")]
+    assert report["retry"] == []
+    assert sorted(handler.delivered) == ["flaky@example.com", "ok@example.com"]
+
+def test_batch_hands_back_messages_when_the_server_is_down(monkeypatch):
+    monkeypatch.setattr(mail, "retry_delay", lambda attempt: 0)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    options = {"hostname": "127.0.0.1", "port": port, "use_tls": False, "start_tls": False}
+
+    report = asyncio.run(send_batch([message("a@example.com")], options, DomainRateLimiter(1000, 1000), attempts=2))
+
+    assert report == {"sent": 0, "rejected": [], "retry": [message("a@example.com")], "refused_recipients": []}
+
+def test_batch_reports_recipients_refused_from_a_delivered_message(smtp_server):
+    handler, options = smtp_server
+    shared = {"recipients": ["ok@example.com", "bounce@example.com", "flaky@example.com"], "subject": "Hi", "body": "hi"}
+
+    report = asyncio.run(send_batch([shared], options, DomainRateLimiter(1000, 1000)))
+
+    assert report["sent"] == 1
+    assert report["refused_recipients"] == ["bounce@example.com"]
+    # the deferred recipient is retried on its own
+    assert report["retry"] == [{**shared, "recipients": ["flaky@example.com"]}]
+    assert handler.delivered == ["ok@example.com"]
+
+def test_batch_task_retries_only_the_failed_messages(monkeypatch):
+    calls = []
+
+    async def fake_send_batch(messages):
+        calls.append(messages)
+        return {"sent": len(messages) - 1 if len(calls) == 1 else 1, "rejected": [], "retry": messages[:1] if len(calls) == 1 else [], "refused_recipients": []}
+    monkeypatch.setattr(celery_tasks, "send_batch", fake_send_batch)
+    monkeypatch.setattr(celery_tasks, "retry_delay", lambda attempt: 0)
+    messages = [message("a@example.com"), message("b@example.com")]
+
+    # published by the relay with messages as a keyword
+    result = celery_tasks.send_email_batch.apply(kwargs={"messages": messages})
+
+    assert result.successful(), result.traceback
+    assert calls == [messages, messages[:1]]
+    assert result.result == {"sent": 1, "rejected": 0, "refused_recipients": 0}
+
+def test_rate_limiter_spaces_out_sends_per_domain():
+    now = [0.0]
+    limiter = DomainRateLimiter(rate=2, burst=2, clock=lambda: now[0])
+
+    assert [limiter.reserve("example.com") for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    # other domains have their own bucket
+    assert limiter.reserve("example.org") == 0.0
+    now[0] = 10.0
+    assert limiter.reserve("example.com") == 0.0
+
+def test_interleave_by_domain_round_robins():
+    messages = [message("a@big.com"), message("b@big.com"), message("c@big.com"), message("d@small.com")]
+
+    ordered = [m["recipients"][0] for m in interleave_by_domain(messages)]
+
+    assert ordered == ["a@big.com", "d@small.com", "b@big.com", "c@big.com"]
@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from src import app
+from src.metrics import statement_operation, start_publish, finish_publish
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_statement_operation_labels_by_leading_keyword():
+    assert statement_operation("  select books.uid FROM books") == "SELECT"
+    assert statement_operation("UPDATE books SET review_count=1") == "UPDATE"
+    assert statement_operation("") == "UNKNOWN"
+
+def test_requests_are_recorded_by_route_template():
+    client = TestClient(app, base_url="http://localhost")
+    labels = {"method": "GET", "route": "/api/v1/books/{book_id}", "status": "403"}
+    before = sample("bookly_http_request_duration_seconds_count", **labels)
+
+    client.get("/api/v1/books/6f1c5c1e-1111-4b8e-9c55-0a1b2c3d4e5f")
+    response = client.get("/metrics")
+
+    assert sample("bookly_http_request_duration_seconds_count", **labels) == before + 1
+    assert 'route="/api/v1/books/{book_id}"' in response.text
+
+def test_celery_publish_latency_is_recorded():
+    before = sample("bookly_celery_enqueue_duration_seconds_count", task="src.celery_tasks.send_email")
+
+    start_publish(sender="src.celery_tasks.send_email", headers={"id": "task-1"})
+    finish_publish(sender="src.celery_tasks.send_email", headers={"id": "task-1"})
+    # a publish we never saw start is ignored
+    finish_publish(sender="src.celery_tasks.send_email", headers={"id": "task-2"})
+
+    assert sample("bookly_celery_enqueue_duration_seconds_count", task="src.celery_tasks.send_email") == before + 1
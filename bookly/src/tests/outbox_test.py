@@ -0,0 +1,141 @@
+import asyncio
+import os
+import subprocess
+import sys
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.auth import service as auth_service
+from src.auth.schemas import CreateUser
+from src.celery_tasks import send_email
+from src.db.models import OutboxMessage, User
+from src.outbox import SEND_EMAIL, enqueue_task, relay_batch, drain_outbox, plan_publishes
+
+TEST_DATABASE_URI = os.environ.get("TEST_DATABASE_URI")
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+class FakeSession:
+    def __init__(self, messages=()):
+        self.messages = list(messages)
+        self.added = []
+        self.statements = []
+        self.commits = 0
+
+    def add(self, row):
+        self.added.append((row, self.commits))
+
+    async def exec(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self.messages)
+
+    async def commit(self):
+        self.commits += 1
+
+def test_create_user_queues_verification_email_in_its_transaction(monkeypatch):
+    async def fake_hash(password):
+        return "hashed"
+    monkeypatch.setattr(auth_service, "generate_hash", fake_hash)
+    session = FakeSession()
+    user_data = CreateUser(username="ada", email="ada@example.com", password="password123", first_name="Ada", last_name="L")
+
+    asyncio.run(auth_service.UserService().create_user(user_data, session))
+
+    (user, user_commits), (message, message_commits) = session.added
+    assert isinstance(user, User) and isinstance(message, OutboxMessage)
+    # both added before the one commit
+    assert user_commits == message_commits == 0 and session.commits == 1
+    assert message.task == SEND_EMAIL == send_email.name
+    assert message.payload["recipients"] == ["ada@example.com"]
+    assert "/api/v1/auth/verify/" in message.payload["body"]
+
+def test_relay_keeps_unpublished_messages_when_the_broker_fails():
+    messages = [OutboxMessage(id=i, task="tasks.t", payload={"n": i}) for i in (1, 2, 3)]
+    session = FakeSession(messages)
+    published = []
+
+    def publish(task, kwargs, task_id):
+        if kwargs["n"] == 2:
+            raise ConnectionError("broker down")
+        published.append(task_id)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(relay_batch(session, publish, limit=10))
+
+    assert published == ["outbox-1"]
+    select_statement, delete_statement = session.statements
+    assert "FOR UPDATE SKIP LOCKED" in str(select_statement.compile(dialect=postgresql.dialect()))
+    assert delete_statement.compile().params["id_1"] == [1]
+    assert session.commits == 1
+
+def test_enqueue_task_does_not_publish():
+    session = FakeSession()
+
+    message = enqueue_task(session, SEND_EMAIL, recipients=["a@example.com"], subject="Hi", body="<p>hi</p>")
+
+    assert session.added == [(message, 0)]
+    assert message.payload == {"recipients": ["a@example.com"], "subject": "Hi", "body": "<p>hi</p>"}
+
+def test_web_app_does_not_import_the_celery_module():
+    # the worker module builds the relay's engine at import time
+    check = "import sys, src; assert 'src.celery_tasks' not in sys.modules"
+
+    subprocess.run([sys.executable, "-c", check], check=True)
+
+def test_relay_batches_runs_of_emails():
+    messages = [
+        OutboxMessage(id=1, task=send_email.name, payload={"n": 1}),
+        OutboxMessage(id=2, task=send_email.name, payload={"n": 2}),
+        OutboxMessage(id=3, task="tasks.other", payload={"n": 3}),
+        OutboxMessage(id=4, task=send_email.name, payload={"n": 4}),
+    ]
+
+    publishes = plan_publishes(messages, {send_email.name: "tasks.send_email_batch"})
+
+    assert publishes == [
+        ("tasks.send_email_batch", {"messages": [{"n": 1}, {"n": 2}]}, [1, 2]),
+        ("tasks.other", {"n": 3}, [3]),
+        ("tasks.send_email_batch", {"messages": [{"n": 4}]}, [4]),
+    ]
+
+async def relay_concurrently():
+    engine = create_async_engine(TEST_DATABASE_URI, poolclass=NullPool)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.drop_all)
+            await conn.run_sync(SQLModel.metadata.create_all)
+        session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with session_maker() as session:
+            for i in range(250):
+                enqueue_task(session, SEND_EMAIL, recipients=[f"user{i}@example.com"], subject="Hi", body="hi")
+            await session.commit()
+
+        published = []
+
+        def publish(task, kwargs, task_id):
+            published.append(task_id)
+
+        relayed = await asyncio.gather(*(drain_outbox(session_maker, publish, batch_size=20) for _ in range(3)))
+        async with engine.connect() as conn:
+            remaining = (await conn.execute(text("SELECT count(*) FROM outbox"))).scalar()
+        return relayed, published, remaining
+    finally:
+        await engine.dispose()
+
+@pytest.mark.skipif(not TEST_DATABASE_URI, reason="TEST_DATABASE_URI is not set")
+def test_concurrent_relays_publish_each_message_once():
+    relayed, published, remaining = asyncio.run(relay_concurrently())
+
+    assert sum(relayed) == 250
+    assert len(published) == len(set(published)) == 250
+    assert remaining == 0
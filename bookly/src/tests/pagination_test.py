@@ -0,0 +1,30 @@
+import pytest
+from datetime import datetime
+import uuid
+from src.db.pagination import encode_cursor, decode_cursor, paginate
+from src.books.service import keyset_after
+from src.errors import InvalidCursor
+from sqlmodel import select
+from src.db.models import Book
+
+
+def test_cursor_round_trip():
+    payload = {"created_at": datetime(2025, 8, 14, 2, 40).isoformat(), "uid": str(uuid.uuid4())}
+
+    assert decode_cursor(encode_cursor(payload)) == payload
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+    with pytest.raises(InvalidCursor):
+        keyset_after(select(Book), encode_cursor({"uid": "nope"}))
+
+def test_paginate_only_emits_cursor_when_more_rows_exist():
+    page, next_cursor = paginate([1, 2, 3], 3, lambda row: {"n": row})
+    assert page == [1, 2, 3]
+    assert next_cursor is None
+
+    page, next_cursor = paginate([1, 2, 3, 4], 3, lambda row: {"n": row})
+    assert page == [1, 2, 3]
+    assert decode_cursor(next_cursor) == {"n": 3}
@@ -0,0 +1,32 @@
+import asyncio
+from passlib.context import CryptContext
+from prometheus_client import REGISTRY
+from src.auth import utils
+
+
+def sample(name):
+    return REGISTRY.get_sample_value(name) or 0.0
+
+def test_hashing_runs_in_bounded_pool(monkeypatch):
+    monkeypatch.setattr(utils, "pwd_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=4))
+
+    async def scenario():
+        hashes = await asyncio.gather(*(utils.generate_hash(f"password-{i}") for i in range(8)))
+        checks = await asyncio.gather(*(utils.verify_password(f"password-{i}", h) for i, h in enumerate(hashes)))
+        return checks
+
+    completed = sample("bookly_password_hash_completed_total")
+    assert all(asyncio.run(scenario()))
+    assert sample("bookly_password_hash_queued") == 0
+    assert sample("bookly_password_hash_in_flight") == 0
+    assert sample("bookly_password_hash_max_queued") >= 8 - utils.Config.PASSWORD_HASH_CONCURRENCY
+    assert sample("bookly_password_hash_completed_total") == completed + 16
+
+def test_outdated_work_factor_is_rehashed(monkeypatch):
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("password")
+    monkeypatch.setattr(utils, "pwd_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=5))
+
+    valid, new_hash = asyncio.run(utils.verify_and_update_password("password", old_hash))
+
+    assert valid
+    assert new_hash is not None and new_hash.startswith("$2b$05$")
@@ -0,0 +1,64 @@
+import asyncio
+from prometheus_client import REGISTRY
+from src.db.redis import PrincipalCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+
+    async def get(self, name):
+        self.gets += 1
+        return self.data.get(name)
+
+    async def set(self, name, value, ex=None):
+        self.data[name] = value
+
+    async def delete(self, name):
+        self.data.pop(name, None)
+
+principal = {"uid": "u1", "email": "a@b.c", "role": "user", "is_verified": True, "token_version": 0}
+
+def lookups(result):
+    return REGISTRY.get_sample_value("bookly_principal_cache_lookups_total", {"result": result}) or 0.0
+
+def test_local_lru_answers_before_redis():
+    redis = FakeRedis()
+    cache = PrincipalCache(redis, ttl=60, local_ttl=60, local_size=10)
+    misses, local_hits = lookups("miss"), lookups("local_hit")
+
+    async def scenario():
+        assert await cache.get("u1") is None
+        await cache.set("u1", principal)
+        assert await cache.get("u1") == principal
+        assert await cache.get("u1") == principal
+
+    asyncio.run(scenario())
+
+    assert redis.gets == 1
+    assert lookups("miss") == misses + 1
+    assert lookups("local_hit") == local_hits + 2
+
+def test_invalidate_drops_local_and_redis_entries():
+    redis = FakeRedis()
+    cache = PrincipalCache(redis, ttl=60, local_ttl=60, local_size=10)
+
+    async def scenario():
+        await cache.set("u1", principal)
+        await cache.invalidate("u1")
+        return await cache.get("u1")
+
+    assert asyncio.run(scenario()) is None
+    assert redis.data == {}
+
+def test_local_lru_is_bounded():
+    cache = PrincipalCache(FakeRedis(), ttl=60, local_ttl=60, local_size=2)
+
+    async def scenario():
+        for uid in ("u1", "u2", "u3"):
+            await cache.set(uid, {**principal, "uid": uid})
+
+    asyncio.run(scenario())
+
+    assert list(cache.local) == ["u2", "u3"]
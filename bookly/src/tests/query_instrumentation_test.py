@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+import pytest
+from src.db.instrumentation import QueryStats, capture_queries, current_stats, record_statement, queries_in
+
+
+def test_capture_queries_collects_statements_inside_the_block():
+    with capture_queries(track_statements=True) as stats:
+        record_statement("SELECT 1", (), 0.002)
+        record_statement("SELECT 1", (), 0.003)
+    record_statement("SELECT 2", (), 1.0)
+
+    assert stats.count == 2
+    assert stats.duration == pytest.approx(0.005)
+    assert current_stats.get() is None
+
+def test_duplicates_and_repeats_are_told_apart():
+    stats = QueryStats(track_statements=True)
+    for book_uid in ["a", "b", "c"]:
+        stats.record("SELECT * FROM reviews WHERE book_uid = $1", (book_uid,), 0.001)
+    stats.record("SELECT * FROM books WHERE uid = $1", ("a",), 0.001)
+    stats.record("SELECT * FROM books WHERE uid = $1", ("a",), 0.001)
+
+    assert stats.duplicates() == ["SELECT * FROM books WHERE uid = $1"]
+    assert stats.repeated(threshold=3) == ["SELECT * FROM reviews WHERE book_uid = $1"]
+
+def test_statements_are_not_kept_unless_tracking():
+    stats = QueryStats()
+    stats.record("SELECT 1", (), 0.001)
+    stats.record("SELECT 1", (), 0.001)
+
+    assert stats.count == 2
+    assert stats.duplicates() == []
+
+def test_queries_in_reads_the_server_timing_header():
+    stats = QueryStats()
+    stats.record("SELECT 1", (), 0.0125)
+    response = SimpleNamespace(headers={"server-timing": f"{stats.server_timing()}, app;dur=20.0"})
+
+    assert stats.server_timing() == 'db;dur=12.5;desc="1 queries"'
+    assert queries_in(response) == 1
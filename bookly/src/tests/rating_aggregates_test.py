@@ -0,0 +1,40 @@
+import uuid
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql
+from src.reviews.schemas import CreateReview
+from src.reviews.service import rating_update
+
+
+def compile_update(statement):
+    return statement.compile(dialect=postgresql.dialect())
+
+def test_rating_update_adds_to_aggregates():
+    book_uid = uuid.uuid4()
+
+    compiled = compile_update(rating_update(book_uid, 3, 1))
+
+    sql = str(compiled)
+    assert "review_count=(books.review_count + %(review_count_1)s)" in sql
+    assert "rating_sum=(books.rating_sum + %(rating_sum_1)s)" in sql
+    assert "rating_histogram[%(rating_histogram_1)s]=(books.rating_histogram[%(rating_histogram_2)s] + %(param_1)s)" in sql
+    assert "rating_avg=CASE WHEN" in sql
+    # zero-indexed in Python, one-indexed in Postgres
+    assert compiled.params["rating_histogram_1"] == compiled.params["rating_histogram_2"] == 4
+    assert compiled.params["review_count_1"] == 1
+    assert compiled.params["rating_sum_1"] == 3
+    assert compiled.params["uid_1"] == book_uid
+
+def test_rating_update_removes_from_aggregates():
+    compiled = compile_update(rating_update(uuid.uuid4(), 2, -1))
+
+    assert compiled.params["rating_histogram_1"] == 3
+    assert compiled.params["param_1"] == -1
+    assert compiled.params["review_count_1"] == -1
+    assert compiled.params["rating_sum_1"] == -2
+
+def test_create_review_rejects_ratings_outside_histogram():
+    with pytest.raises(ValidationError):
+        CreateReview(rating=-1, review_text="nope")
+    with pytest.raises(ValidationError):
+        CreateReview(rating=5, review_text="nope")
@@ -0,0 +1,44 @@
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from src.db import main
+
+
+def fake_session_maker(name):
+    @asynccontextmanager
+    async def session_maker():
+        yield name
+    return session_maker
+
+def authenticated_request(user_uid):
+    context = SimpleNamespace(token_data={"user": {"user_uid": user_uid}})
+    return SimpleNamespace(state=SimpleNamespace(auth_context=context))
+
+async def resolve(request):
+    async for session in main.get_read_session(request):
+        return session
+
+def use_fakes(monkeypatch, recent_writers):
+    replicas = [fake_session_maker("replica-1"), fake_session_maker("replica-2")]
+    monkeypatch.setattr(main, "async_session_maker", fake_session_maker("primary"))
+    monkeypatch.setattr(main, "replica_session_makers", replicas)
+    monkeypatch.setattr(main, "replica_cycle", itertools.cycle(replicas))
+
+    async def fake_has_recent_write(user_uid):
+        return user_uid in recent_writers
+
+    monkeypatch.setattr(main, "has_recent_write", fake_has_recent_write)
+
+def test_reads_round_robin_over_replicas(monkeypatch):
+    use_fakes(monkeypatch, recent_writers=set())
+
+    sessions = [asyncio.run(resolve(authenticated_request("reader"))) for _ in range(3)]
+
+    assert sessions == ["replica-1", "replica-2", "replica-1"]
+
+def test_recent_writer_reads_from_primary(monkeypatch):
+    use_fakes(monkeypatch, recent_writers={"writer"})
+
+    assert asyncio.run(resolve(authenticated_request("writer"))) == "primary"
+    assert asyncio.run(resolve(authenticated_request("reader"))) == "replica-1"
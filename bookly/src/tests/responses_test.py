@@ -0,0 +1,35 @@
+import json
+import uuid
+from datetime import datetime
+from src.auth.schemas import UserModel
+from src.db.models import Review
+from src.responses import ORJSONResponse, model_response
+
+
+class DriverUUID(uuid.UUID):
+    pass
+
+def test_orjson_response_encodes_uuid_subclasses_and_nested_models():
+    uid = uuid.uuid4()
+    review = Review(uid=uid, rating=3, review_text="ok", created_at=datetime(2024, 5, 1), updated_at=datetime(2024, 5, 1))
+
+    body = json.loads(ORJSONResponse({"id": DriverUUID(str(uid)), "reviews": [review]}).body)
+
+    assert body["id"] == str(uid)
+    assert body["reviews"][0]["uid"] == str(uid)
+    assert body["reviews"][0]["created_at"] == "2024-05-01T00:00:00"
+
+def test_model_response_applies_schema_exclusions_and_validators():
+    user = {
+        "uid": uuid.uuid4(), "username": "reader", "email": "reader@example.com", "password": "hash",
+        "first_name": "Re", "last_name": "Ader", "created_at": datetime(2024, 5, 1),
+        "updated_at": datetime(2024, 5, 1), "is_verified": True
+    }
+
+    response = model_response(UserModel, user, etag='"v1"', last_modified=datetime(2024, 5, 1))
+
+    body = json.loads(response.body)
+    assert "password" not in body
+    assert body["email"] == "reader@example.com"
+    assert response.headers["etag"] == '"v1"'
+    assert response.headers["content-type"] == "application/json"
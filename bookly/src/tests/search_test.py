@@ -0,0 +1,64 @@
+import uuid
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.dialects import postgresql
+from src.books.service import search_cursor, parse_search_cursor, search_statement
+from src.db.models import Book, book_search_vector
+from src.db.pagination import encode_cursor
+from src.errors import InvalidCursor
+
+
+def compile_search(*args, **kwargs):
+    return search_statement(*args, **kwargs).compile(dialect=postgresql.dialect())
+
+def test_search_cursor_round_trips():
+    uid = uuid.uuid4()
+    row = SimpleNamespace(_mapping={"Book": None}, Book=Book(uid=uid), rank=0.25)
+
+    assert parse_search_cursor(encode_cursor(search_cursor(row))) == (0.25, uid)
+
+def test_search_cursor_from_projected_rows():
+    uid = uuid.uuid4()
+    row = SimpleNamespace(_mapping={"uid": uid, "rank": 0.5}, uid=uid, rank=0.5)
+
+    assert parse_search_cursor(encode_cursor(search_cursor(row))) == (0.5, uid)
+
+@pytest.mark.parametrize("payload", [
+    {"uid": str(uuid.uuid4())},
+    {"rank": "high", "uid": str(uuid.uuid4())},
+    {"rank": 0.5, "uid": "nope"},
+    {"rank": None, "uid": None},
+])
+def test_invalid_search_cursors_are_rejected(payload):
+    with pytest.raises(InvalidCursor):
+        parse_search_cursor(encode_cursor(payload))
+
+    with pytest.raises(InvalidCursor):
+        search_statement("dune", 20, encode_cursor(payload))
+
+def test_search_statement_ranks_matches_of_the_web_search_query():
+    compiled = compile_search("frank herbert -messiah", 20)
+
+    sql = str(compiled)
+    assert "books.search_vector @@ websearch_to_tsquery(%(websearch_to_tsquery_1)s, %(websearch_to_tsquery_2)s)" in sql
+    assert "ts_rank_cd(books.search_vector, websearch_to_tsquery(" in sql
+    assert "ORDER BY ts_rank_cd(" in sql and "DESC, books.uid DESC" in sql
+    assert compiled.params["websearch_to_tsquery_1"] == "english"
+    assert compiled.params["websearch_to_tsquery_2"] == "frank herbert -messiah"
+    assert compiled.params["param_1"] == 21
+
+def test_search_statement_continues_after_the_cursor():
+    uid = uuid.uuid4()
+
+    compiled = compile_search("dune", 20, encode_cursor({"rank": 0.1, "uid": str(uid)}))
+
+    assert "(ts_rank_cd(books.search_vector, websearch_to_tsquery(" in str(compiled)
+    assert ", books.uid) < (" in str(compiled)
+    assert 0.1 in compiled.params.values() and uid in compiled.params.values()
+
+def test_search_vector_matches_the_migration():
+    from importlib import import_module
+    migration = import_module("migrations.versions.b6cca45c2fa4_add_book_search_vector")
+    source = open(migration.__file__).read()
+
+    assert book_search_vector.computed.sqltext.text in source
@@ -0,0 +1,52 @@
+import random
+from collections import Counter
+from src.db.models import RATING_BUCKETS
+from src.db.seed import BOOK_COLUMNS, REVIEW_COLUMNS, USER_COLUMNS, generate_catalog, generate_users
+
+
+def generate(seed=0, users=200, books=2000, reviews=10000):
+    rng = random.Random(seed)
+    user_rows = generate_users(users, "hash", rng)
+    book_rows, review_rows = [], []
+    for book_batch, review_batch in generate_catalog(user_rows, books, reviews, rng, batch_size=300):
+        book_rows.extend(book_batch)
+        review_rows.extend(review_batch)
+    return user_rows, book_rows, review_rows
+
+def as_dicts(rows, columns):
+    return [dict(zip(columns, row)) for row in rows]
+
+def test_same_seed_generates_the_same_rows():
+    assert generate(seed=1) == generate(seed=1)
+    assert generate(seed=1)[1] != generate(seed=2)[1]
+
+def test_book_aggregates_match_their_reviews():
+    users, books, reviews = generate()
+    users, books, reviews = as_dicts(users, USER_COLUMNS), as_dicts(books, BOOK_COLUMNS), as_dicts(reviews, REVIEW_COLUMNS)
+    by_book = {}
+    for review in reviews:
+        by_book.setdefault(review["book_uid"], []).append(review)
+
+    assert len(books) == 2000 and len(reviews) == 10000
+    for book in books:
+        ratings = [review["rating"] for review in by_book.get(book["uid"], [])]
+        assert book["review_count"] == len(ratings)
+        assert book["rating_sum"] == sum(ratings)
+        assert book["rating_histogram"] == [ratings.count(rating) for rating in range(RATING_BUCKETS)]
+        assert book["rating_avg"] == (sum(ratings) / len(ratings) if ratings else None)
+        assert all(review["created_at"] >= book["created_at"] for review in by_book.get(book["uid"], []))
+
+    user_uids = {user["uid"] for user in users}
+    assert {book["user_uid"] for book in books} <= user_uids
+    assert {review["user_uid"] for review in reviews} <= user_uids
+
+def test_activity_is_skewed():
+    _, books, reviews = generate()
+    review_counts = sorted((row[BOOK_COLUMNS.index("review_count")] for row in books), reverse=True)
+    submissions = sorted(Counter(row[BOOK_COLUMNS.index("user_uid")] for row in books).values(), reverse=True)
+
+    # the top 1% of books hold a large share of the reviews while a long tail has none
+    assert sum(review_counts[:20]) > 0.25 * len(reviews)
+    assert review_counts.count(0) > 0.2 * len(books)
+    # and the most prolific user submits far more than the median one
+    assert submissions[0] > 10 * submissions[len(submissions) // 2]